@@ -0,0 +1,283 @@
+import gzip
+import io
+import json
+import os
+from hashlib import sha256
+
+import pandas as pd
+from flask import Blueprint, Response, abort, request, send_file
+from pages import get_forecast_data, get_leaderboard_df, select_best_model
+from store import current_forecast_dir
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+data_sources_json_file = open("../shared_config/data_sources.json")
+series_list = json.load(data_sources_json_file)
+data_sources_json_file.close()
+
+series_titles = set(series_dict["title"] for series_dict in series_list)
+
+mimetypes = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Whole catalogue exports written by the updater (updater/export.py)
+export_files = {
+    "csv": ("export.csv.gz", "application/gzip"),
+    "parquet": ("export.parquet", "application/vnd.apache.parquet"),
+}
+
+# Responses smaller than this are not worth compressing
+min_compress_size = 512
+
+# title -> (file mtime, ETag seed), so conditional requests for unchanged
+# series do not unpickle anything
+series_etag_seeds = {}
+
+
+def data_hash():
+    # Written by the updater (run_models) and only changes with the data
+    stats = get_forecast_data("statistics")
+    if "data_hash" in stats:
+        return stats["data_hash"]
+
+    # Older statistics files: fall back to the forecast files themselves
+    return sha256(
+        str(
+            sorted(
+                (entry.name, entry.stat().st_mtime_ns)
+                for entry in os.scandir(current_forecast_dir())
+            )
+        ).encode()
+    ).hexdigest()
+
+
+def series_etag_seed(title):
+
+    mtime = os.path.getmtime(f"{current_forecast_dir()}/{title}.pkl")
+
+    if title not in series_etag_seeds or series_etag_seeds[title][0] != mtime:
+        data_dict = get_forecast_data(title)
+        series_etag_seeds[title] = (
+            mtime,
+            "{}|{}".format(
+                data_dict["downloaded_dict"]["hashsum"],
+                data_dict["forecasted_at"].isoformat(),
+            ),
+        )
+
+    return series_etag_seeds[title][1]
+
+
+def response_format():
+
+    format_name = request.args.get("format")
+
+    if format_name is None:
+        best = request.accept_mimetypes.best_match(
+            [mimetypes["json"], mimetypes["csv"], mimetypes["arrow"]],
+            default=mimetypes["json"],
+        )
+        format_name = {v: k for k, v in mimetypes.items()}[best]
+
+    if format_name not in mimetypes:
+        abort(400, f"Unknown format {format_name}")
+
+    if format_name == "arrow" and pa is None:
+        abort(406, "Arrow output needs pyarrow")
+
+    return format_name
+
+
+def content_encoding():
+
+    if brotli is not None and "br" in request.accept_encodings:
+        return "br"
+    if "gzip" in request.accept_encodings:
+        return "gzip"
+    return None
+
+
+def conditional_response(etag_seed, render):
+    # Strong ETag over the data version and everything that changes the
+    # bytes of the response. render() is only called on a cache miss.
+
+    format_name = response_format()
+    encoding = content_encoding()
+
+    etag = sha256(
+        "|".join(
+            [etag_seed, request.full_path, format_name, encoding or ""]
+        ).encode()
+    ).hexdigest()
+
+    response = Response(mimetype=mimetypes[format_name])
+    response.set_etag(etag)
+    response.vary.add("Accept")
+    response.vary.add("Accept-Encoding")
+
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+
+    body = render(format_name)
+
+    if encoding and len(body) >= min_compress_size:
+        if encoding == "br":
+            body = brotli.compress(body)
+        else:
+            body = gzip.compress(body)
+        response.content_encoding = encoding
+
+    response.set_data(body)
+
+    return response
+
+
+def render_table(df, format_name, json_meta=None):
+
+    if format_name == "csv":
+        return df.to_csv(index=False).encode()
+
+    if format_name == "arrow":
+        sink = io.BytesIO()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+
+    records = json.loads(df.to_json(orient="records", date_format="iso"))
+
+    return json.dumps({**(json_meta or {}), "data": records}).encode()
+
+
+def get_series_table(data_dict, model_name):
+    # History and forecast joined on date: value, forecast and the bounds
+    # of every interval level
+
+    series_df = data_dict["downloaded_dict"]["series_df"]
+    forecast_df = data_dict["all_forecasts"][model_name]["forecast_df"]
+
+    table_df = series_df[["value"]].join(forecast_df, how="outer")
+    table_df.index.name = "date"
+
+    return table_df.reset_index()
+
+
+@api.route("/series")
+def series_index():
+    def render(format_name):
+
+        rows = []
+
+        for series_dict in series_list:
+            try:
+                data_dict = get_forecast_data(series_dict["title"])
+            except FileNotFoundError:
+                continue
+
+            rows.append(
+                {
+                    "title": series_dict["title"],
+                    "short_title": series_dict.get("short_title"),
+                    "frequency": series_dict["frequency"],
+                    "tags": ",".join(series_dict["tags"]),
+                    "source_url": series_dict["url"],
+                    "best_model": select_best_model(data_dict),
+                    "forecasted_at": data_dict["forecasted_at"],
+                }
+            )
+
+        return render_table(pd.DataFrame(rows), format_name)
+
+    return conditional_response(data_hash(), render)
+
+
+@api.route("/series/<path:title>")
+def series_detail(title):
+
+    if title not in series_titles:
+        abort(404)
+
+    try:
+        etag_seed = series_etag_seed(title)
+    except FileNotFoundError:
+        abort(404)
+
+    def render(format_name):
+
+        data_dict = get_forecast_data(title)
+
+        model_name = request.args.get("model", select_best_model(data_dict))
+
+        if model_name not in data_dict["all_forecasts"]:
+            abort(404, f"Unknown model {model_name}")
+
+        model_dict = data_dict["all_forecasts"][model_name]
+
+        return render_table(
+            get_series_table(data_dict, model_name),
+            format_name,
+            json_meta={
+                "title": title,
+                "model": model_name,
+                "model_description": model_dict["model_description"],
+                "cv_score": model_dict["cv_score"],
+                "forecasted_at": data_dict["forecasted_at"].isoformat(),
+                "downloaded_at": data_dict["downloaded_dict"][
+                    "downloaded_at"
+                ].isoformat(),
+            },
+        )
+
+    return conditional_response(etag_seed, render)
+
+
+@api.route("/leaderboard")
+def leaderboard():
+    def render(format_name):
+
+        counts = get_leaderboard_df(series_list)
+        counts.index.name = "Method"
+
+        return render_table(counts.reset_index(), format_name)
+
+    return conditional_response(data_hash(), render)
+
+
+@api.route("/export")
+def export():
+
+    format_name = request.args.get("format", "csv")
+
+    if format_name not in export_files:
+        abort(400, f"Unknown format {format_name}")
+
+    filename, mimetype = export_files[format_name]
+    filepath = os.path.abspath(f"{current_forecast_dir()}/{filename}")
+
+    if not os.path.isfile(filepath):
+        abort(404)
+
+    # Streamed from disk in blocks by the WSGI server
+    return send_file(
+        filepath,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f"forecasts.{filename.split('.', 1)[1]}",
+        etag=sha256(f"{data_hash()}|{filename}".encode()).hexdigest(),
+        conditional=True,
+    )
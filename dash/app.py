@@ -1,5 +1,7 @@
+from api import api
 from flask import Flask
-from multipage import Route, MultiPageApp
+from lazy import LazyMultiPageApp
+from multipage import Route
 from pages import Index, Series, Search, Leaderboard
 from pages_static import Methodology, About
 
@@ -20,7 +22,7 @@ dynamic_routes = [
 ]
 
 
-class MyApp(MultiPageApp):
+class MyApp(LazyMultiPageApp):
     def get_routes(self):
 
         return [
@@ -30,6 +32,7 @@ class MyApp(MultiPageApp):
 
 
 server = Flask(__name__)
+server.register_blueprint(api)
 
 app = MyApp(name="", server=server, url_base_pathname="")
 
@@ -0,0 +1,177 @@
+// Client-side callbacks for the Series page (see pages.Series).
+//
+// The server sends the whole series once per URL as a dcc.Store payload
+// (pages.get_series_payload). Switching model or table only picks the
+// matching parts of that payload, without a round trip to the server.
+
+(function() {
+
+    function component(namespace, type, props) {
+        return {namespace: namespace, type: type, props: props};
+    }
+
+    function html(type, children, props) {
+        return component(
+            'dash_html_components', type,
+            Object.assign({children: children}, props || {})
+        );
+    }
+
+    function dbc(type, children, props) {
+        return component(
+            'dash_bootstrap_components', type,
+            Object.assign({children: children}, props || {})
+        );
+    }
+
+    // Plotly typed array ({dtype: 'f8', bdata: <base64>}) to Float64Array
+    function decodeArray(array) {
+        var binary = window.atob(array.bdata);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new Float64Array(bytes.buffer);
+    }
+
+    // Zoomed out history with the full resolution window spliced in
+    function historyTrace(data, window_data) {
+        var x = decodeArray(data.history.x);
+        var y = decodeArray(data.history.y);
+
+        if (window_data && window_data.title === data.title) {
+            var window_x = decodeArray(window_data.x);
+            var window_y = decodeArray(window_data.y);
+
+            var start = window_x[0];
+            var end = window_x[window_x.length - 1];
+
+            var before = 0;
+            while (before < x.length && x[before] < start) { before++; }
+            var after = before;
+            while (after < x.length && x[after] <= end) { after++; }
+
+            var merged_x = new Float64Array(
+                before + window_x.length + x.length - after
+            );
+            var merged_y = new Float64Array(merged_x.length);
+
+            merged_x.set(x.subarray(0, before));
+            merged_x.set(window_x, before);
+            merged_x.set(x.subarray(after), before + window_x.length);
+            merged_y.set(y.subarray(0, before));
+            merged_y.set(window_y, before);
+            merged_y.set(y.subarray(after), before + window_y.length);
+
+            x = merged_x;
+            y = merged_y;
+        }
+
+        return Object.assign({}, data.history, {x: x, y: y});
+    }
+
+    function selectedModel(data, model_name) {
+        if (!data || !model_name || !(model_name in data.models)) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        return data.models[model_name];
+    }
+
+    function listItem(heading, text) {
+        return dbc('ListGroupItem', [
+            dbc('ListGroupItemHeading', heading),
+            dbc('ListGroupItemText', text)
+        ]);
+    }
+
+    // Interval levels present in the payload, e.g. [50, 75, 95]
+    function forecastLevels(data) {
+        var columns = Object.keys(
+            data.models[Object.keys(data.models)[0]].table.columns
+        );
+        return columns.filter(function(column) {
+            return column.indexOf('LB_') === 0;
+        }).map(function(column) {
+            return parseInt(column.slice(3), 10);
+        }).sort(function(a, b) { return a - b; });
+    }
+
+    // 'Forecast' or 'CI_<level>' to the table columns to show
+    function selectedColumns(table_value) {
+        if (table_value === 'Forecast') {
+            return ['Forecast'];
+        }
+        var level = table_value.slice(3);
+        return ['LB_' + level, 'UB_' + level];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        series: {
+            figure: function(data, model_name, window_data) {
+                var model = selectedModel(data, model_name);
+
+                return {
+                    data: model.traces.concat(
+                        [historyTrace(data, window_data)]
+                    ),
+                    layout: data.layout
+                };
+            },
+
+            meta_data_list: function(data, model_name) {
+                var model = selectedModel(data, model_name);
+
+                var description =
+                    model.description === model_name ? '' : model.description;
+
+                return dbc('ListGroup', [
+                    listItem('Model Details', [
+                        html('P', model_name),
+                        html('P', description),
+                        html('P', 'CV score: ' + model.cv_score)
+                    ]),
+                    listItem('Forecast Updated At', data.forecasted_at),
+                    listItem('Data Collected At', data.downloaded_at),
+                    listItem('Data Source', [
+                        html('A', data.url, {href: data.url})
+                    ])
+                ]);
+            },
+
+            forecast_table_options: function(data) {
+                if (!data) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                return [{label: 'Forecast', value: 'Forecast'}].concat(
+                    forecastLevels(data).map(function(level) {
+                        return {label: level + '% CI', value: 'CI_' + level};
+                    })
+                );
+            },
+
+            forecast_table: function(data, model_name, table_value) {
+                var table = selectedModel(data, model_name).table;
+                var columns = selectedColumns(table_value).filter(
+                    function(column) { return column in table.columns; }
+                );
+
+                var head = html('Thead', html('Tr',
+                    [html('Th', 'Date')].concat(columns.map(
+                        function(column) { return html('Th', column); }
+                    ))
+                ));
+
+                var body = html('Tbody', table.index.map(function(date, i) {
+                    return html('Tr', [html('Td', date)].concat(columns.map(
+                        function(column) {
+                            return html('Td', table.columns[column][i]);
+                        }
+                    )));
+                }));
+
+                return dbc('Table', [head, body]);
+            }
+        }
+    });
+
+})();
@@ -1,24 +1,19 @@
-import textwrap
 from datetime import datetime
 
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_dangerously_set_inner_html
 import dash_html_components as html
-import html2text
 import humanize
-import markdown2
-from common import BootstrapApp, header, breadcrumb_layout, footer
+from blog_index import blog_index
+from common import BootstrapApp, header, breadcrumb_layout, static_footer
 from dash.dependencies import Input, Output
 from dash.exceptions import PreventUpdate
-from frontmatter import Frontmatter
 from multipage import Route, MultiPageApp
-from util import glob_re, location_ignore_null, parse_state
+from util import location_ignore_null, parse_state
 
 import math
 
-markdown_extras = ["cuddled-lists"]
-
 
 class Blog(BootstrapApp):
     def setup(self):
@@ -37,7 +32,7 @@ class Blog(BootstrapApp):
                         ),
                         html.Div(id="body"),
                     ]
-                    + footer(),
+                    + static_footer(),
                     style={"margin-bottom": "64px"},
                 ),
             ]
@@ -55,25 +50,9 @@ class Blog(BootstrapApp):
 
             page_int = int(parse_result["page"][0])
 
-            # Load blog posts
-            filenames = glob_re(r".*.md", "../blog")
-            n_posts = len(filenames)
-
-            blog_posts = []
-
-            for filename in filenames:
-                fm_dict = Frontmatter.read_file("../blog/" + filename)
-                fm_dict["filename"] = filename.split(".md")[0]
-                blog_posts.append(fm_dict)
-
-            # Sort by date
-            blog_posts = sorted(
-                blog_posts, key=lambda x: x["attributes"]["date"], reverse=True
-            )
-
-            # Render post previews
-            h = html2text.HTML2Text()
-            h.ignore_links = True
+            # Parsed, sorted and rendered once per change to the blog
+            blog_posts = blog_index().posts
+            n_posts = len(blog_posts)
 
             n_posts_per_page = 5
 
@@ -85,43 +64,27 @@ class Blog(BootstrapApp):
             for i in range(start, end):
                 blog_post = blog_posts[i]
 
-                if (
-                    "type" in blog_post["attributes"]
-                    and blog_post["attributes"]["type"] == "html"
-                ):
-                    body_html = blog_post["body"]
-                else:
-                    body_html = markdown2.markdown(
-                        blog_post["body"], extras=markdown_extras
-                    )
-
-                preview = textwrap.shorten(
-                    h.handle(body_html), 280, placeholder="..."
-                )
-
                 body.append(
                     dbc.Row(
                         dbc.Col(
                             [
                                 html.A(
                                     html.H2(
-                                        blog_post["attributes"]["title"],
+                                        blog_post.attributes["title"],
                                         style={"padding-top": "8px"},
                                     ),
-                                    href=f"post?title={blog_post['filename']}",
-                                    id=blog_post["filename"],
+                                    href=f"post?title={blog_post.slug}",
+                                    id=blog_post.slug,
                                 ),
                                 html.P(
                                     [
                                         " by ",
-                                        blog_post["attributes"]["author"],
+                                        blog_post.attributes["author"],
                                         ", ",
                                         humanize.naturaltime(
                                             datetime.now()
                                             - datetime.strptime(
-                                                blog_post["attributes"][
-                                                    "date"
-                                                ],
+                                                blog_post.attributes["date"],
                                                 "%Y-%m-%d",
                                             )
                                         ),
@@ -129,7 +92,8 @@ class Blog(BootstrapApp):
                                     className="subtitle mt-0 text-muted small",
                                 ),
                                 html.Div(
-                                    preview, style={"padding-bottom": "8px"}
+                                    blog_post.preview,
+                                    style={"padding-bottom": "8px"},
                                 ),
                                 html.A(
                                     html.P(
@@ -139,7 +103,7 @@ class Blog(BootstrapApp):
                                         ),
                                         style={"padding-bottom": "24px"},
                                     ),
-                                    href=f"post?title={blog_post['filename']}",
+                                    href=f"post?title={blog_post.slug}",
                                 ),
                                 html.Hr(),
                             ],
@@ -206,7 +170,7 @@ class Post(BootstrapApp):
                         ),
                         dbc.Row(dbc.Col(id="post", lg=12)),
                     ]
-                    + footer(),
+                    + static_footer(),
                     style={"margin-bottom": "64px"},
                 ),
             ]
@@ -219,62 +183,61 @@ class Post(BootstrapApp):
         def update_breadcrumb(url):
             parse_result = parse_state(url)
 
-            if "title" in parse_result:
-                title = parse_result["title"][0]
-
-            try:
-                filename = glob_re(f"{title}.md", "../blog")[0]
-            except:
+            if "title" not in parse_result:
                 raise PreventUpdate
 
-            fm_dict = Frontmatter.read_file("../blog/" + filename)
-            fm_dict["filename"] = filename.split(".md")[0]
+            # Plain dictionary lookup: the title is never used as a pattern
+            # or a path
+            blog_post = blog_index().slugs.get(parse_result["title"][0])
+
+            if blog_post is None:
+                raise PreventUpdate
 
-            return fm_dict["attributes"]["title"]
+            return blog_post.attributes["title"]
 
         @self.callback(Output("post", "children"), inputs)
         @location_ignore_null(inputs, location_id="url")
         def update_content(url):
             parse_result = parse_state(url)
 
-            if "title" in parse_result:
-                title = parse_result["title"][0]
-
-            try:
-                filename = glob_re(f"{title}.md", "../blog")[0]
-            except:
+            if "title" not in parse_result:
                 raise PreventUpdate
 
-            blog_post = Frontmatter.read_file("../blog/" + filename)
-            blog_post["filename"] = filename.split(".md")[0]
+            # Plain dictionary lookup: the title is never used as a pattern
+            # or a path
+            blog_post = blog_index().slugs.get(parse_result["title"][0])
+
+            if blog_post is None:
+                raise PreventUpdate
 
             return [
                 html.A(
-                    html.H2(blog_post["attributes"]["title"]),
-                    href=f"/blog?post={blog_post['filename']}",
-                    id=blog_post["filename"],
+                    html.H2(blog_post.attributes["title"]),
+                    href=f"/blog?post={blog_post.slug}",
+                    id=blog_post.slug,
                 ),
                 html.Hr(),
                 html.P(
                     [
                         " by ",
-                        blog_post["attributes"]["author"],
+                        blog_post.attributes["author"],
                         ", ",
                         humanize.naturaltime(
                             datetime.now()
                             - datetime.strptime(
-                                blog_post["attributes"]["date"], "%Y-%m-%d"
+                                blog_post.attributes["date"], "%Y-%m-%d"
                             )
                         ),
                     ],
                     className="subtitle mt-0 text-muted small",
                 ),
+                # Read once per (slug, mtime) by the blog index
                 dash_dangerously_set_inner_html.DangerouslySetInnerHTML(
-                    blog_post["body"]
+                    blog_post.body
                 )
-                if "type" in blog_post["attributes"]
-                and blog_post["attributes"]["type"] == "html"
-                else dcc.Markdown(blog_post["body"]),
+                if "type" in blog_post.attributes
+                and blog_post.attributes["type"] == "html"
+                else dcc.Markdown(blog_post.body),
             ]
 
 
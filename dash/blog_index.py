@@ -0,0 +1,89 @@
+import os
+import textwrap
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import html2text
+import markdown2
+from frontmatter import Frontmatter
+
+blog_dir = "../blog"
+
+markdown_extras = ["cuddled-lists"]
+
+preview_length = 280
+
+BlogPost = namedtuple(
+    "BlogPost", ["slug", "mtime", "attributes", "body", "html", "preview"]
+)
+
+# posts: newest first, slugs: slug (filename without .md) -> BlogPost
+BlogIndex = namedtuple("BlogIndex", ["posts", "slugs"])
+
+
+def render_post_html(fm_dict):
+
+    if (
+        "type" in fm_dict["attributes"]
+        and fm_dict["attributes"]["type"] == "html"
+    ):
+        return fm_dict["body"]
+
+    return markdown2.markdown(fm_dict["body"], extras=markdown_extras)
+
+
+# Keyed by (slug, mtime) so a rebuild only parses and renders posts that
+# were added or changed
+@lru_cache(maxsize=1024)
+def read_post(slug, mtime):
+
+    fm_dict = Frontmatter.read_file(f"{blog_dir}/{slug}.md")
+
+    body_html = render_post_html(fm_dict)
+
+    h = html2text.HTML2Text()
+    h.ignore_links = True
+
+    return BlogPost(
+        slug,
+        mtime,
+        fm_dict["attributes"],
+        fm_dict["body"],
+        body_html,
+        textwrap.shorten(
+            h.handle(body_html), preview_length, placeholder="..."
+        ),
+    )
+
+
+def build_blog_index():
+
+    posts = [
+        read_post(entry.name[: -len(".md")], entry.stat().st_mtime_ns)
+        for entry in os.scandir(blog_dir)
+        if entry.name.endswith(".md") and entry.is_file()
+    ]
+
+    # Sort by date
+    posts = sorted(posts, key=lambda x: x.attributes["date"], reverse=True)
+
+    return BlogIndex(posts, {post.slug: post for post in posts})
+
+
+# Adding, removing or replacing a post changes the directory mtime
+_blog_state = {"mtime": None, "index": BlogIndex([], {})}
+_blog_lock = threading.Lock()
+
+
+def blog_index():
+
+    mtime = os.stat(blog_dir).st_mtime_ns
+
+    if mtime != _blog_state["mtime"]:
+        with _blog_lock:
+            if mtime != _blog_state["mtime"]:
+                _blog_state["index"] = build_blog_index()
+                _blog_state["mtime"] = mtime
+
+    return _blog_state["index"]
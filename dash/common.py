@@ -1,5 +1,8 @@
 import os
+import time
 from abc import ABC, abstractmethod
+from collections import namedtuple
+from functools import lru_cache
 
 import dash
 import dash_bootstrap_components as dbc
@@ -7,10 +10,104 @@ import dash_core_components as dcc
 import dash_html_components as html
 
 
-def header():
+# Gotcha: The seemingly redundant ../.git is a workaround for docker
+# container isolation: .git is exported to /.git as read-only volume.
+git_dir = "../.git"
+
+# Seconds between checks for a new checked out commit. 0 disables the check
+# and the footer shows the commit found at startup. The footer of the pages
+# rendered to files (static_footer) has no commit.
+git_watch_interval = float(os.environ.get("GIT_WATCH_INTERVAL", "0"))
+
+GitVersion = namedtuple(
+    "GitVersion", ["hash", "shorthash", "time", "author", "subject"]
+)
+
+
+def read_git_version():
+
+    git_hash = ""
+    git_shorthash = "Unknown commit"
+    git_time = "00:00"
+    git_author = "Unknown author"
+    git_subject = ""
+
+    # Get the current git status
+    # %n: literal newline
+    # %H: commit hash
+    # %h: abbreviated commit hash
+    # %ai: author date
+    # %an: author name
+    # %s: subject
+    git_cmd = (
+        f"git --git-dir {git_dir} show --no-patch "
+        '--format="%H%n%h%n%ai%n%an%n%s"'
+    )
+    git_output = os.popen(git_cmd).read().splitlines()
+
+    if len(git_output) >= 5:
+        git_hash = git_output[0]
+        git_shorthash = git_output[1]
+        git_time = git_output[2]
+        git_author = git_output[3]
+
+        # Gotcha: git_subject might contain newlines
+        git_subject = "\n".join(git_output[4:])
+
+    return GitVersion(
+        git_hash, git_shorthash, git_time, git_author, git_subject
+    )
+
+
+def git_head_stamp():
+    """Identify the checked out commit by reading files, without forking."""
+
+    try:
+        with open(f"{git_dir}/HEAD") as head_file:
+            head = head_file.read().strip()
+
+        if not head.startswith("ref: "):
+            return head
+
+        ref_path = f"{git_dir}/{head[len('ref: '):]}"
+        if os.path.isfile(ref_path):
+            with open(ref_path) as ref_file:
+                return ref_file.read().strip()
+
+        # Branch only present in packed-refs
+        return os.stat(f"{git_dir}/packed-refs").st_mtime_ns
+
+    except OSError:
+        return None
+
+
+_git_state = {
+    "version": read_git_version(),
+    "stamp": git_head_stamp(),
+    "checked_at": time.monotonic(),
+}
+
+
+def git_version():
+
+    if (
+        git_watch_interval > 0
+        and time.monotonic() - _git_state["checked_at"] > git_watch_interval
+    ):
+        _git_state["checked_at"] = time.monotonic()
+        stamp = git_head_stamp()
+        if stamp != _git_state["stamp"]:
+            _git_state["stamp"] = stamp
+            _git_state["version"] = read_git_version()
+
+    return _git_state["version"]
+
+
+@lru_cache(maxsize=1)
+def _header():
     from app import nav_routes
 
-    return [
+    return (
         dbc.NavbarSimple(
             children=[
                 dbc.NavItem(dbc.NavLink(x[1], href=x[2], external_link=True))
@@ -31,11 +128,16 @@ def header():
             color="dark",
             dark=True,
             expand="lg",
-        )
-    ]
+        ),
+    )
 
 
-def breadcrumb_layout(crumbs):
+def header():
+    return list(_header())
+
+
+@lru_cache(maxsize=None)
+def _breadcrumb_layout(crumbs):
 
     return dbc.Nav(
         [
@@ -61,74 +163,60 @@ def breadcrumb_layout(crumbs):
     )
 
 
-def component_git_version():
+def breadcrumb_layout(crumbs):
+    return _breadcrumb_layout(tuple(tuple(crumb) for crumb in crumbs))
 
-    git_hash = ""
-    git_shorthash = "Unknown commit"
-    git_time = "00:00"
-    git_author = "Unknown author"
-    git_subject = ""
 
-    # Get the current git status
-    # %n: literal newline
-    # %H: commit hash
-    # %h: abbreviated commit hash
-    # %ai: author date
-    # %an: author name
-    # %s: subject
-    # Gotcha: The seemingly redundant --git-dir ../.git is a workaround for
-    # docker container isolation: .git is exported to /.git as read-only volume.
-    git_cmd = (
-        'git --git-dir ../.git show --no-patch --format="%H%n%h%n%ai%n%an%n%s"'
-    )
-    git_output = os.popen(git_cmd).read().splitlines()
+def component_git_version(version):
 
-    if len(git_output) >= 5:
-        git_hash = git_output[0]
-        git_shorthash = git_output[1]
-        git_time = git_output[2]
-        git_author = git_output[3]
+    github_home_url = "https://github.com/sjtrny/forecast_dash/"
 
-        # Gotcha: git_subject might contain newlines
-        git_subject = "\n".join(git_output[4:])
+    homepage = html.P(
+        [
+            html.A("Development homepage", href=github_home_url),
+            " on github.",
+        ]
+    )
 
-    github_home_url = "https://github.com/sjtrny/forecast_dash/"
-    github_patch_url = github_home_url + "commit/" + git_hash
+    if version is None:
+        return dbc.Col([homepage])
+
+    github_patch_url = github_home_url + "commit/" + version.hash
 
     return dbc.Col(
         [
             dbc.Card(
                 [
-                    dbc.CardHeader(git_time),
+                    dbc.CardHeader(version.time),
                     dbc.CardBody(
                         [
-                            html.H6(git_subject, className="card-title"),
-                            html.P(f"by {git_author}", className="card-text"),
+                            html.H6(version.subject, className="card-title"),
+                            html.P(
+                                f"by {version.author}", className="card-text"
+                            ),
                         ]
                     ),
                     dbc.CardFooter(
                         [
-                            dbc.CardLink(git_shorthash, href=github_patch_url),
+                            dbc.CardLink(
+                                version.shorthash, href=github_patch_url
+                            ),
                         ]
                     ),
                 ],
                 color="dark",
                 outline=True,
             ),
-            html.P(
-                [
-                    html.A("Development homepage", href=github_home_url),
-                    " on github.",
-                ]
-            ),
+            homepage,
         ]
     )
 
 
-def footer():
+@lru_cache(maxsize=1)
+def _footer(version):
     from app import home_route, nav_routes
 
-    return [
+    return (
         dbc.Row(
             dbc.Col(html.Hr(style={"margin-top": "64px"}), lg=12),
         ),
@@ -151,11 +239,22 @@ def footer():
                     lg=7,
                     style={"margin-bottom": "16px"},
                 ),
-                component_git_version(),
+                component_git_version(version),
             ],
             style={"margin-bottom": "64px"},
         ),
-    ]
+    )
+
+
+def footer():
+    # Built once per commit and shared by every layout
+    return list(_footer(git_version()))
+
+
+def static_footer():
+    # Without the commit, for layouts built once and rendered to files by
+    # prerender.py, which would show it long after another is checked out
+    return list(_footer(None))
 
 
 class BootstrapApp(dash.Dash, ABC):
@@ -213,7 +312,7 @@ class MarkdownApp(BootstrapApp):
                         ),
                         dcc.Markdown(type(self).markdown),
                     ]
-                    + footer()
+                    + static_footer()
                 ),
             ]
         )
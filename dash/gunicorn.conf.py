@@ -0,0 +1,84 @@
+# Production server settings, read by gunicorn at startup (see startup.sh).
+# Every setting can be overridden from the environment.
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:80")
+
+# One worker per core. Rendering is CPU bound, so more processes than cores
+# only queue for the CPU and raise tail latency.
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+
+# gthread lets a worker keep serving other requests while one thread waits
+# on a slow callback. "gevent" also works if gevent is installed.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Import the app once in the master. Pages, the blog index and the data
+# store built there are shared copy-on-write by every forked worker.
+preload_app = True
+os.environ.setdefault("LAZY_ROUTES", "0")
+
+# Seconds between checks for a newly published data version. 0 disables
+# the check and workers pick up new versions on their own.
+data_watch_interval = float(os.environ.get("DATA_WATCH_INTERVAL", "30"))
+
+
+def build_shared_state():
+
+    from blog_index import blog_index
+    from store import current_store
+
+    blog_index()
+    current_store()
+
+
+def watch_data_version(current_forecast_dir):
+    # Runs in a thread of the master, which only reads the symlink and sends
+    # HUP. The new version is loaded by on_reload on the master's main
+    # thread, the one that forks the workers, so no worker can be forked
+    # while this thread holds a lock on the shared state.
+
+    version_dir = os.path.realpath(current_forecast_dir())
+
+    while True:
+        time.sleep(data_watch_interval)
+
+        new_version_dir = os.path.realpath(current_forecast_dir())
+
+        if new_version_dir != version_dir:
+            version_dir = new_version_dir
+            os.kill(os.getpid(), signal.SIGHUP)
+
+
+def on_reload(server):
+
+    # Load the new version in the master before HUP starts new workers
+    # forked from it. The old ones finish the requests they are serving.
+    from store import current_forecast_dir
+
+    server.log.info(
+        "Loading data version %s", os.path.realpath(current_forecast_dir())
+    )
+    build_shared_state()
+
+
+def when_ready(server):
+
+    from store import current_forecast_dir
+
+    build_shared_state()
+
+    if data_watch_interval > 0:
+        threading.Thread(
+            target=watch_data_version,
+            args=(current_forecast_dir,),
+            daemon=True,
+        ).start()
@@ -0,0 +1,111 @@
+import os
+import resource
+import threading
+import time
+from abc import ABC
+
+from flask import Flask
+from multipage import MultiPageApp
+from werkzeug.exceptions import HTTPException, NotFound
+
+
+class LazyRoute:
+    """
+    WSGI app that builds a route's Dash app on its own Flask server the
+    first time a request for it arrives.
+
+    Dash registers its URL rules when it is constructed and Flask refuses
+    new rules once a server has started handling requests, so each route
+    gets a private server instead of sharing the main one.
+    """
+
+    def __init__(self, route, url_base_pathname):
+        self.route = route
+        self.url_base_pathname = url_base_pathname
+        self.prefix = url_base_pathname.rstrip("/")
+        self.server = None
+        self.lock = threading.Lock()
+
+    def matches(self, path):
+        return path == self.prefix or path.startswith(self.prefix + "/")
+
+    def build(self):
+        with self.lock:
+            if self.server is None:
+                start = time.perf_counter()
+
+                server = Flask(self.route.name)
+                self.route.app_cls(
+                    name=self.route.name,
+                    server=server,
+                    url_base_pathname=self.url_base_pathname,
+                )
+                self.server = server
+
+                server.logger.info(
+                    "Built %s in %.3fs, maxrss %d kB",
+                    self.route.name,
+                    time.perf_counter() - start,
+                    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                )
+
+        return self.server
+
+    def __call__(self, environ, start_response):
+        server = self.server if self.server is not None else self.build()
+        return server(environ, start_response)
+
+
+class LazyMultiPageApp(MultiPageApp, ABC):
+    """
+    MultiPageApp whose routes are only built when first requested.
+
+    Requests matching a rule registered directly on `server` are still
+    handled by it. Set LAZY_ROUTES=0 to build every route at startup, and
+    WARM_UP_ROUTES=1 to build them in a background thread after startup.
+    """
+
+    def __init__(self, name, server, url_base_pathname):
+
+        self.server = server
+
+        # Longest prefix first so that "/" only catches what is left over
+        self.lazy_routes = sorted(
+            [
+                LazyRoute(route, url_base_pathname + route.url_base_pathname)
+                for route in self.get_routes()
+            ],
+            key=lambda lazy_route: len(lazy_route.prefix),
+            reverse=True,
+        )
+
+        self.server_wsgi_app = server.wsgi_app
+        server.wsgi_app = self.dispatch
+
+        if os.environ.get("LAZY_ROUTES", "1") == "0":
+            self.build_all()
+        elif os.environ.get("WARM_UP_ROUTES", "0") == "1":
+            threading.Thread(target=self.build_all, daemon=True).start()
+
+    def build_all(self):
+        for lazy_route in self.lazy_routes:
+            lazy_route.build()
+
+    def dispatch(self, environ, start_response):
+
+        try:
+            self.server.url_map.bind_to_environ(environ).match()
+            return self.server_wsgi_app(environ, start_response)
+        except NotFound:
+            pass
+        except HTTPException:
+            # Redirects and method errors for the server's own rules
+            return self.server_wsgi_app(environ, start_response)
+
+        path = environ.get("PATH_INFO", "")
+
+        for lazy_route in self.lazy_routes:
+            if lazy_route.matches(path):
+                return lazy_route(environ, start_response)
+
+        return self.server_wsgi_app(environ, start_response)
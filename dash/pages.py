@@ -11,17 +11,28 @@ import dash_html_components as html
 import humanize
 import numpy as np
 import pandas as pd
+from blog_index import blog_index
 from common import BootstrapApp, header, breadcrumb_layout, footer
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 from dash.exceptions import PreventUpdate
-from frontmatter import Frontmatter
+from store import current_forecast_dir, current_store
 from util import (
-    glob_re,
     location_ignore_null,
     parse_state,
     apply_default_value,
+    datetime_to_ms,
+    downsample_lttb,
+    encode_array,
 )
 
+# Points in the zoomed out history trace; the visible window is fetched at
+# full resolution when the user moves the range slider.
+max_history_points = 1000
+
+# Only a window of more points than this, far more than any series has, is
+# downsampled
+max_window_points = 100000
+
 
 def dash_kwarg(inputs):
     def accept_func(func):
@@ -36,67 +47,79 @@ def dash_kwarg(inputs):
     return accept_func
 
 
+# Fill colours of the narrowest and widest intervals run_models has used,
+# interpolated for any other level
+ci_colour_levels = [50, 75, 95]
+ci_colours = np.array([[226, 87, 78], [234, 130, 112], [243, 179, 160]])
+
+
+def get_forecast_levels(forecast_df):
+    return sorted(
+        int(column[len("LB_") :])
+        for column in forecast_df.columns
+        if column.startswith("LB_")
+    )
+
+
 def get_forecast_plot_data(series_df, forecast_df):
 
     # Plot series history
     line_history = dict(
         type="scatter",
-        x=series_df.index,
-        y=series_df["value"],
+        x=datetime_to_ms(series_df.index),
+        y=series_df["value"].values,
         name="Historical",
         mode="lines+markers",
         line=dict(color="rgb(0, 0, 0)"),
     )
 
-    forecast_error_x = list(forecast_df.index) + list(
-        reversed(forecast_df.index)
-    )
-    forecast_error_x = [x.to_pydatetime() for x in forecast_error_x]
+    # Widest interval first so the narrower ones are drawn on top
+    levels = get_forecast_levels(forecast_df)[::-1]
 
-    # Plot CI50
-    error_50 = dict(
-        type="scatter",
-        x=forecast_error_x,
-        y=list(forecast_df["UB_50"]) + list(reversed(forecast_df["LB_50"])),
-        fill="tozeroy",
-        fillcolor="rgb(226, 87, 78)",
-        line=dict(color="rgba(255,255,255,0)"),
-        name="50% CI",
-    )
+    forecast_x = datetime_to_ms(forecast_df.index)
 
-    # Plot CI75
-    error_75 = dict(
-        type="scatter",
-        x=forecast_error_x,
-        y=list(forecast_df["UB_75"]) + list(reversed(forecast_df["LB_75"])),
-        fill="tozeroy",
-        fillcolor="rgb(234, 130, 112)",
-        line=dict(color="rgba(255,255,255,0)"),
-        name="75% CI",
+    # Each band is a polygon running along the upper bound and back along
+    # the lower bound: one column per level.
+    band_x = np.concatenate([forecast_x, forecast_x[::-1]])
+    band_y = np.concatenate(
+        [
+            forecast_df[[f"UB_{level}" for level in levels]].values,
+            forecast_df[[f"LB_{level}" for level in levels]].values[::-1],
+        ]
     )
 
-    # Plot CI95
-    error_95 = dict(
-        type="scatter",
-        x=forecast_error_x,
-        y=list(forecast_df["UB_95"]) + list(reversed(forecast_df["LB_95"])),
-        fill="tozeroy",
-        fillcolor="rgb(243, 179, 160)",
-        line=dict(color="rgba(255,255,255,0)"),
-        name="95% CI",
-    )
+    band_colours = np.stack(
+        [
+            np.interp(levels, ci_colour_levels, ci_colours[:, channel])
+            for channel in range(3)
+        ],
+        axis=1,
+    ).round()
+
+    error_bands = [
+        dict(
+            type="scatter",
+            x=band_x,
+            y=band_y[:, i],
+            fill="tozeroy",
+            fillcolor="rgb({:.0f}, {:.0f}, {:.0f})".format(*band_colours[i]),
+            line=dict(color="rgba(255,255,255,0)"),
+            name=f"{level}% CI",
+        )
+        for i, level in enumerate(levels)
+    ]
 
     # Plot forecast
     line_forecast = dict(
         type="scatter",
-        x=forecast_df.index,
-        y=forecast_df["forecast"],
+        x=forecast_x,
+        y=forecast_df["forecast"].values,
         name="Forecast",
         mode="lines",
         line=dict(color="rgb(0,0,0)", dash="2px"),
     )
 
-    data = [error_95, error_75, error_50, line_forecast, line_history]
+    data = error_bands + [line_forecast, line_history]
 
     return data
 
@@ -175,6 +198,7 @@ def get_thumbnail_figure(data_dict):
         showlegend=False,
         xaxis=dict(
             fixedrange=True,
+            type="date",
             range=[series_df.index[0], forecast_df.index[-1]],
             gridcolor="rgb(255,255,255)",
         ),
@@ -262,8 +286,89 @@ def get_series_figure(data_dict, model_name):
     return dict(data=data, layout=layout)
 
 
+def get_history_payload(series_df, n_out):
+
+    x = datetime_to_ms(series_df.index)
+    y = series_df["value"].values
+
+    kept = downsample_lttb(x, y, n_out)
+
+    return {"x": encode_array(x[kept]), "y": encode_array(y[kept])}
+
+
+# Everything the Series page needs, sent once to a dcc.Store. The history
+# trace and the layout are shared by every model, so only the forecast
+# traces and table columns are stored per model. Switching model or table
+# is then done in the browser (assets/series.js).
+def get_series_payload(data_dict):
+
+    best_model_name = select_best_model(data_dict)
+
+    series_figure = get_series_figure(data_dict, best_model_name)
+
+    no_history_df = data_dict["downloaded_dict"]["series_df"].iloc[:0, :]
+
+    models = {}
+
+    for model_name, forecast_dict in data_dict["all_forecasts"].items():
+
+        forecast_df = forecast_dict["forecast_df"]
+
+        # The history trace is always last
+        model_traces = get_forecast_plot_data(no_history_df, forecast_df)[:-1]
+
+        table_df = forecast_df.rename({"forecast": "Forecast"}, axis=1).round(
+            4
+        )
+
+        models[model_name] = {
+            "description": forecast_dict["model_description"],
+            "cv_score": "%f" % forecast_dict["cv_score"],
+            "traces": model_traces,
+            "table": {
+                "index": list(table_df.index.strftime("%Y-%m-%d %H:%M:%S")),
+                "columns": {
+                    column: table_df[column].values
+                    for column in table_df.columns
+                },
+            },
+        }
+
+    series_df = data_dict["downloaded_dict"]["series_df"]
+
+    history_trace = series_figure["data"][-1]
+    history_trace.update(get_history_payload(series_df, max_history_points))
+
+    layout = series_figure["layout"]
+    # Keep the user's range when the full resolution window comes in
+    layout["uirevision"] = data_dict["data_source_dict"]["title"]
+
+    return {
+        "title": data_dict["data_source_dict"]["title"],
+        "history": history_trace,
+        "layout": layout,
+        "models": models,
+        "forecasted_at": data_dict["forecasted_at"].strftime(
+            "%Y-%m-%d %H:%M:%S"
+        ),
+        "downloaded_at": data_dict["downloaded_dict"][
+            "downloaded_at"
+        ].strftime("%Y-%m-%d %H:%M:%S"),
+        "url": data_dict["data_source_dict"]["url"],
+    }
+
+
 def get_forecast_data(title):
-    f = open(f"../data/forecasts/{title}.pkl", "rb")
+
+    # Memory mapped arrays shared by all workers, once the updater has
+    # written them
+    store = current_store()
+    if store is not None:
+        if title == "statistics":
+            return store.statistics
+        return store.series_data(title)
+
+    f = open(f"{current_forecast_dir()}/{title}.pkl", "rb")
     data_dict = pickle.load(f)
     return data_dict
 
@@ -342,19 +447,7 @@ def component_figs_3col(row_title, series_titles):
 
 def component_news_4col():
 
-    filenames = glob_re(r".*.md", "../blog")
-
-    blog_posts = []
-
-    for filename in filenames:
-        fm_dict = Frontmatter.read_file("../blog/" + filename)
-        fm_dict["filename"] = filename.split(".md")[0]
-        blog_posts.append(fm_dict)
-
-    # Sort by date
-    blog_posts = sorted(
-        blog_posts, key=lambda x: x["attributes"]["date"], reverse=True
-    )
+    blog_posts = blog_index().posts
 
     body = []
 
@@ -362,7 +455,7 @@ def component_news_4col():
         blog_post = blog_posts[i]
         blog_timedelta = humanize.naturaltime(
             datetime.now()
-            - datetime.strptime(blog_post["attributes"]["date"], "%Y-%m-%d")
+            - datetime.strptime(blog_post.attributes["date"], "%Y-%m-%d")
         )
         body.extend(
             [
@@ -370,8 +463,8 @@ def component_news_4col():
                     blog_timedelta, className="subtitle mt-0 text-muted small"
                 ),
                 html.A(
-                    html.P(blog_post["attributes"]["title"], className="lead"),
-                    href=f"/blog/post?title={blog_post['filename']}",
+                    html.P(blog_post.attributes["title"], className="lead"),
+                    href=f"/blog/post?title={blog_post.slug}",
                 ),
             ]
         )
@@ -424,10 +517,26 @@ class Index(BootstrapApp):
         series_list = json.load(data_sources_json_file)
         data_sources_json_file.close()
 
-        feature_series_title = "Australian GDP Growth"
+        # The series shown, shared with the updater, which forecasts and
+        # refreshes them first
+        index_page_json_file = open("../shared_config/index_page.json")
+        index_page = json.load(index_page_json_file)
+        index_page_json_file.close()
+
+        feature_series_title = index_page["featured"]
+        leaderboard_series_title = index_page["leaderboard"]
 
         def layout_func():
 
+            snapshot_rows = [
+                (
+                    component_figs_3col
+                    if len(series_titles) == 3
+                    else component_figs_2col
+                )(row_title, series_titles)
+                for row_title, series_titles in index_page["snapshots"].items()
+            ]
+
             return html.Div(
                 header()
                 + [
@@ -494,22 +603,15 @@ class Index(BootstrapApp):
                                 ],
                                 style={"margin-top": "16px"},
                             ),
-                            # Row 2 - US Snapshot
-                            component_figs_3col(
-                                "US Snapshot 🇺🇸",
-                                [
-                                    "US Unemployment",
-                                    "US GDP Growth",
-                                    "US Personal Consumption Expenditures: Chain-type Price Index (% Change, 1 Year)",
-                                ],
-                            ),
+                            # Row 2 - First snapshot
+                            snapshot_rows[0],
                             # Row 3 - Leaderboard
                             dbc.Row(
                                 [
                                     dbc.Col(
                                         [
                                             html.H3(
-                                                "US Unemployment",
+                                                leaderboard_series_title,
                                                 style={"text-align": "center"},
                                             ),
                                             html.A(
@@ -517,7 +619,7 @@ class Index(BootstrapApp):
                                                     dcc.Graph(
                                                         figure=get_thumbnail_figure(
                                                             get_forecast_data(
-                                                                "US Unemployment"
+                                                                leaderboard_series_title
                                                             )
                                                         ),
                                                         config={
@@ -525,7 +627,7 @@ class Index(BootstrapApp):
                                                         },
                                                     )
                                                 ],
-                                                href=f"/series?{urlencode({'title': 'US Unemployment'})}",
+                                                href=f"/series?{urlencode({'title': leaderboard_series_title})}",
                                             ),
                                         ],
                                         lg=8,
@@ -534,24 +636,9 @@ class Index(BootstrapApp):
                                     component_leaderboard_4col(series_list),
                                 ]
                             ),
-                            # Row 4 - Australia Snapshot
-                            component_figs_3col(
-                                "Australia Snapshot 🇦🇺",
-                                [
-                                    "Australian GDP Growth",
-                                    "Australian Inflation (CPI)",
-                                    "Australian Unemployment",
-                                ],
-                            ),
-                            # Row 5 - UK Snapshot
-                            component_figs_2col(
-                                "UK Snapshot 🇬🇧",
-                                [
-                                    "UK Unemployment",
-                                    "UK Inflation (RPI)",
-                                ],
-                            ),
                         ]
+                        # Rows 4 and on - Other snapshots
+                        + snapshot_rows[1:]
                         + footer()
                     ),
                 ]
@@ -567,11 +654,38 @@ class Series(BootstrapApp):
             header()
             + [
                 dcc.Location(id="url", refresh=False),
+                dcc.Store(id="series_data"),
+                dcc.Store(id="series_window"),
                 dbc.Container(
                     [
                         breadcrumb_layout([("Home", "/"), ("Series", "")]),
                         dcc.Loading(
-                            dbc.Row([dbc.Col(id="series_graph", lg=12)])
+                            dbc.Row(
+                                [
+                                    dbc.Col(
+                                        dcc.Graph(
+                                            id="series_graph",
+                                            figure={
+                                                "data": [],
+                                                "layout": {"height": 720},
+                                            },
+                                            config={
+                                                "modeBarButtonsToRemove": [
+                                                    "sendDataToCloud",
+                                                    "autoScale2d",
+                                                    "hoverClosestCartesian",
+                                                    "hoverCompareCartesian",
+                                                    "lasso2d",
+                                                    "select2d",
+                                                    "toggleSpikelines",
+                                                ],
+                                                "displaylogo": False,
+                                            },
+                                        ),
+                                        lg=12,
+                                    )
+                                ]
+                            )
                         ),
                         dbc.Row(
                             [
@@ -586,9 +700,7 @@ class Series(BootstrapApp):
                                                 ),
                                             ]
                                         ),
-                                        dcc.Loading(
-                                            html.Div(id="meta_data_list")
-                                        ),
+                                        html.Div(id="meta_data_list"),
                                     ],
                                     lg=6,
                                 ),
@@ -596,24 +708,14 @@ class Series(BootstrapApp):
                                     [
                                         dbc.FormGroup(
                                             [
+                                                # Interval options are filled in
+                                                # from the series' levels
                                                 dcc.Dropdown(
                                                     options=[
                                                         {
                                                             "label": "Forecast",
                                                             "value": "Forecast",
                                                         },
-                                                        {
-                                                            "label": "50% CI",
-                                                            "value": "CI_50",
-                                                        },
-                                                        {
-                                                            "label": "75% CI",
-                                                            "value": "CI_75",
-                                                        },
-                                                        {
-                                                            "label": "95% CI",
-                                                            "value": "CI_95",
-                                                        },
                                                     ],
                                                     value="Forecast",
                                                     clearable=False,
@@ -621,9 +723,7 @@ class Series(BootstrapApp):
                                                 ),
                                             ]
                                         ),
-                                        dcc.Loading(
-                                            html.Div(id="forecast_table")
-                                        ),
+                                        html.Div(id="forecast_table"),
                                     ],
                                     lg=6,
                                 ),
@@ -635,88 +735,38 @@ class Series(BootstrapApp):
             ]
         )
 
-        def series_input(inputs, location_id="url"):
-            def accept_func(func):
-                @wraps(func)
-                def wrapper(*args):
-                    input_names = [item.component_id for item in inputs]
-                    kwargs_dict = dict(zip(input_names, args))
-
-                    parse_result = parse_state(kwargs_dict[location_id])
-
-                    if "title" in parse_result:
-                        title = parse_result["title"][0]
-                        series_data_dict = get_forecast_data(title)
-
-                        del kwargs_dict[location_id]
-                        return func(series_data_dict, **kwargs_dict)
-                    else:
-                        raise PreventUpdate
-
-                return wrapper
-
-            return accept_func
-
         inputs = [Input("url", "href")]
 
-        @self.callback(Output("breadcrumb", "children"), inputs)
-        @location_ignore_null(inputs, location_id="url")
-        @series_input(inputs, location_id="url")
-        def update_breadcrumb(series_data_dict):
-
-            return (
-                series_data_dict["data_source_dict"]["short_title"]
-                if "short_title" in series_data_dict["data_source_dict"]
-                else series_data_dict["data_source_dict"]["title"]
-            )
-
-        @self.callback(
-            Output("series_graph", "children"),
-            inputs + [Input("model_selector", "value")],
-        )
-        @location_ignore_null(inputs, location_id="url")
-        @series_input(
-            inputs + [Input("model_selector", "value")], location_id="url"
-        )
-        def update_series_graph(series_data_dict, **kwargs):
-
-            model_name = kwargs["model_selector"]
-
-            series_figure = get_series_figure(series_data_dict, model_name)
-
-            series_graph = dcc.Graph(
-                figure=series_figure,
-                config={
-                    "modeBarButtonsToRemove": [
-                        "sendDataToCloud",
-                        "autoScale2d",
-                        "hoverClosestCartesian",
-                        "hoverCompareCartesian",
-                        "lasso2d",
-                        "select2d",
-                        "toggleSpikelines",
-                    ],
-                    "displaylogo": False,
-                },
-            )
-
-            return series_graph
-
+        # The only server round trip: load the series once per URL
         @self.callback(
             [
+                Output("series_data", "data"),
+                Output("breadcrumb", "children"),
                 Output("model_selector", "options"),
                 Output("model_selector", "value"),
             ],
             inputs,
         )
         @location_ignore_null(inputs, location_id="url")
-        @series_input(inputs, location_id="url")
-        def update_model_selector(series_data_dict):
+        def update_series_data(url):
+
+            parse_result = parse_state(url)
+
+            if "title" not in parse_result:
+                raise PreventUpdate
+
+            series_data_dict = get_forecast_data(parse_result["title"][0])
+
+            breadcrumb = (
+                series_data_dict["data_source_dict"]["short_title"]
+                if "short_title" in series_data_dict["data_source_dict"]
+                else series_data_dict["data_source_dict"]["title"]
+            )
 
             best_model_name = select_best_model(series_data_dict)
 
-            stats = get_forecast_data("statistics")
-            all_methods = sorted(stats["models_used"])
+            # A model can be missing for a series whose job was stopped
+            all_methods = sorted(series_data_dict["all_forecasts"].keys())
 
             all_methods_dict = dict(zip(all_methods, all_methods))
 
@@ -728,129 +778,100 @@ class Series(BootstrapApp):
                 {"label": v, "value": k} for k, v in all_methods_dict.items()
             ]
 
-            return model_select_options, best_model_name
+            return (
+                get_series_payload(series_data_dict),
+                breadcrumb,
+                model_select_options,
+                best_model_name,
+            )
 
+        # Full resolution history for the range the user is looking at
         @self.callback(
-            Output("meta_data_list", "children"),
-            inputs + [Input("model_selector", "value")],
-        )
-        @location_ignore_null(inputs, location_id="url")
-        @series_input(
-            inputs + [Input("model_selector", "value")], location_id="url"
+            Output("series_window", "data"),
+            [Input("series_graph", "relayoutData")],
+            [State("url", "href")],
         )
-        def update_meta_data_list(series_data_dict, **kwargs):
+        def update_series_window(relayout_data, url):
 
-            model_name = kwargs["model_selector"]
+            if not relayout_data:
+                raise PreventUpdate
 
-            model_description = series_data_dict["all_forecasts"][model_name][
-                "model_description"
-            ]
-            if model_description == model_name:
-                model_description = ""
-
-            model_cv_score = series_data_dict["all_forecasts"][model_name][
-                "cv_score"
-            ]
+            if relayout_data.get("xaxis.autorange"):
+                return None
 
-            return dbc.ListGroup(
-                [
-                    dbc.ListGroupItem(
-                        [
-                            dbc.ListGroupItemHeading("Model Details"),
-                            dbc.ListGroupItemText(
-                                [
-                                    html.P(model_name),
-                                    html.P(model_description),
-                                    html.P("CV score: %f" % model_cv_score),
-                                ]
-                            ),
-                        ]
-                    ),
-                    dbc.ListGroupItem(
-                        [
-                            dbc.ListGroupItemHeading("Forecast Updated At"),
-                            dbc.ListGroupItemText(
-                                series_data_dict["forecasted_at"].strftime(
-                                    "%Y-%m-%d %H:%M:%S"
-                                )
-                            ),
-                        ]
-                    ),
-                    dbc.ListGroupItem(
-                        [
-                            dbc.ListGroupItemHeading("Data Collected At"),
-                            dbc.ListGroupItemText(
-                                series_data_dict["downloaded_dict"][
-                                    "downloaded_at"
-                                ].strftime("%Y-%m-%d %H:%M:%S")
-                            ),
-                        ]
-                    ),
-                    dbc.ListGroupItem(
-                        [
-                            dbc.ListGroupItemHeading("Data Source"),
-                            dbc.ListGroupItemText(
-                                [
-                                    html.A(
-                                        series_data_dict["data_source_dict"][
-                                            "url"
-                                        ],
-                                        href=series_data_dict[
-                                            "data_source_dict"
-                                        ]["url"],
-                                    )
-                                ]
-                            ),
-                        ]
-                    ),
+            if "xaxis.range" in relayout_data:
+                x_range = relayout_data["xaxis.range"]
+            elif "xaxis.range[0]" in relayout_data:
+                x_range = [
+                    relayout_data["xaxis.range[0]"],
+                    relayout_data.get("xaxis.range[1]"),
                 ]
-            )
+            else:
+                raise PreventUpdate
 
-        @self.callback(
-            Output("forecast_table", "children"),
-            inputs
-            + [
-                Input("forecast_table_selector", "value"),
-                Input("model_selector", "value"),
-            ],
-        )
-        @location_ignore_null(inputs, location_id="url")
-        @series_input(
-            inputs
-            + [
-                Input("forecast_table_selector", "value"),
-                Input("model_selector", "value"),
-            ],
-            location_id="url",
-        )
-        def update_forecast_table(series_data_dict, **kwargs):
+            # An open end would filter out every point
+            if len(x_range) != 2 or None in x_range:
+                raise PreventUpdate
 
-            selected_column_map = {
-                "Forecast": ["Forecast"],
-                "CI_50": ["LB_50", "UB_50"],
-                "CI_75": ["LB_75", "UB_75"],
-                "CI_95": ["LB_95", "UB_95"],
-            }
+            parse_result = parse_state(url)
 
-            model_name = kwargs["model_selector"]
+            if "title" not in parse_result:
+                raise PreventUpdate
 
-            dataframe = series_data_dict["all_forecasts"][model_name][
-                "forecast_df"
-            ]
+            series_data_dict = get_forecast_data(parse_result["title"][0])
+            series_df = series_data_dict["downloaded_dict"]["series_df"]
 
-            column_name_map = {"forecast": "Forecast"}
+            start, end = [pd.Timestamp(x) for x in x_range]
 
-            dataframe = dataframe.rename(column_name_map, axis=1)[
-                selected_column_map[kwargs["forecast_table_selector"]]
-            ].round(4)
+            # One point either side so the line runs off the plot edges
+            start_pos = max(series_df.index.searchsorted(start) - 1, 0)
+            end_pos = series_df.index.searchsorted(end, side="right") + 1
 
-            dataframe.index = dataframe.index.strftime("%Y-%m-%d %H:%M:%S")
+            window_df = series_df.iloc[start_pos:end_pos, :]
 
-            table = dbc.Table.from_dataframe(
-                dataframe, index=True, index_label="Date"
-            )
+            return {
+                "title": series_data_dict["data_source_dict"]["title"],
+                **get_history_payload(window_df, max_window_points),
+            }
+
+        # Model and table switching happen in the browser
+        self.clientside_callback(
+            ClientsideFunction(namespace="series", function_name="figure"),
+            Output("series_graph", "figure"),
+            [
+                Input("series_data", "data"),
+                Input("model_selector", "value"),
+                Input("series_window", "data"),
+            ],
+        )
+
+        self.clientside_callback(
+            ClientsideFunction(
+                namespace="series", function_name="meta_data_list"
+            ),
+            Output("meta_data_list", "children"),
+            [Input("series_data", "data"), Input("model_selector", "value")],
+        )
+
+        self.clientside_callback(
+            ClientsideFunction(
+                namespace="series", function_name="forecast_table_options"
+            ),
+            Output("forecast_table_selector", "options"),
+            [Input("series_data", "data")],
+        )
 
-            return table
+        self.clientside_callback(
+            ClientsideFunction(
+                namespace="series", function_name="forecast_table"
+            ),
+            Output("forecast_table", "children"),
+            [
+                Input("series_data", "data"),
+                Input("model_selector", "value"),
+                Input("forecast_table_selector", "value"),
+            ],
+        )
 
 
 def get_leaderboard_df(series_list):
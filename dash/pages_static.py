@@ -2,7 +2,13 @@ import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
 
-from common import MarkdownApp, BootstrapApp, header, breadcrumb_layout, footer
+from common import (
+    MarkdownApp,
+    BootstrapApp,
+    header,
+    breadcrumb_layout,
+    static_footer,
+)
 
 import json
 
@@ -167,7 +173,9 @@ class About(BootstrapApp):
                                                 """
 This website is an intuitive tool that makes business forecasting accessible to the wider community. You can easily obtain predictions of commonly used variables together with the uncertainty around them. The website implements classical forecasting models as well as the novel models and methods developed by the members of the Time Series and Forecasting (TSF) research group in the University of Sydney Business School. The website visualizes and summarizes the forecasting results in an easy-to-understand manner. The forecasts are updated daily and include the latest publicly available information. It is an open-source project under the AGPL license, see 
                                                 """,
-                                                html.A("https://github.com/forecastlab/forecast_dash", href="https://github.com/forecastlab/forecast_dash"
+                                                html.A(
+                                                    "https://github.com/forecastlab/forecast_dash",
+                                                    href="https://github.com/forecastlab/forecast_dash",
                                                 ),
                                                 " .",
                                             ]
@@ -230,7 +238,7 @@ This website is an intuitive tool that makes business forecasting accessible to
                         ),
                         dbc.Row(parse_people(research_team)),
                     ]
-                    + footer(),
+                    + static_footer(),
                     style={"margin-bottom": "64px"},
                     className="mb-5",
                 ),
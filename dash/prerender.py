@@ -0,0 +1,148 @@
+import argparse
+import os
+import sys
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+# Routes whose page, layout and dependencies are the same for every request
+# and data version. Each is rendered to the files nginx serves directly (see
+# nginx/nginx.conf). The blog's posts are filled in by callbacks, which still
+# go through nginx's cache to gunicorn.
+static_routes = ["/methodology/", "/about/", "/blog/", "/blog/post/"]
+
+# Attempts, and seconds between them, to reach gunicorn before verifying
+ready_attempts = 90
+ready_interval = 2
+
+# Everything the browser fetches from gunicorn to show a Dash page
+route_endpoints = ["", "_dash-layout", "_dash-dependencies"]
+
+
+def static_urls():
+    return [
+        route + endpoint
+        for route in static_routes
+        for endpoint in route_endpoints
+    ]
+
+
+def static_file_path(out_dir_path, url):
+    # "/about/" -> about/index.html, "/about/_dash-layout" -> about/_dash-layout
+    if url.endswith("/"):
+        url += "index.html"
+    return os.path.join(out_dir_path, url.lstrip("/"))
+
+
+def prerender(out_dir_path):
+
+    from app import server
+
+    client = server.test_client()
+
+    for url in static_urls():
+        response = client.get(url)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+
+        file_path = static_file_path(out_dir_path, url)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # Replaced atomically so nginx never serves a partial file
+        with open(f"{file_path}.tmp", "wb") as f:
+            f.write(response.data)
+        os.replace(f"{file_path}.tmp", file_path)
+
+        print(f"Rendered {url}")
+
+
+def page_lines(content):
+    # Dash collects component scripts from a set, so the order of the
+    # <script> lines in the page changes from one process to the next
+    return sorted(content.splitlines())
+
+
+def wait_until_ready(live_url):
+    # gunicorn builds every page before it serves, which can take a while
+
+    for _ in range(ready_attempts):
+        try:
+            with urlopen(live_url + static_routes[0]):
+                return True
+        except (URLError, ConnectionError):
+            time.sleep(ready_interval)
+
+    return False
+
+
+def verify(out_dir_path, live_url):
+    # Compare every static file with what gunicorn renders for the same URL
+
+    if not wait_until_ready(live_url):
+        print(f"{live_url} is not serving, nothing can be verified")
+        return static_urls()
+
+    mismatches = []
+
+    for url in static_urls():
+        with open(static_file_path(out_dir_path, url), "rb") as f:
+            static_content = f.read()
+
+        try:
+            with urlopen(live_url + url) as response:
+                live_content = response.read()
+        except URLError:
+            live_content = None
+
+        if live_content is None or page_lines(live_content) != page_lines(
+            static_content
+        ):
+            mismatches.append(url)
+            print(f"Mismatch {url}")
+
+    return mismatches
+
+
+def remove(out_dir_path):
+    # nginx falls back to gunicorn for any file that is missing
+    for url in static_urls():
+        file_path = static_file_path(out_dir_path, url)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+if __name__ == "__main__":
+
+    args_dict = {
+        "o": {
+            "help": "output directory path",
+            "default": "/static_pages",
+            "kw": "out_dir_path",
+        },
+        "v": {
+            "help": "verify against this live server instead of rendering, "
+            "removing every static page on a mismatch",
+            "default": None,
+            "kw": "live_url",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    if final_kwargs["live_url"] is None:
+        prerender(final_kwargs["out_dir_path"])
+    elif verify(final_kwargs["out_dir_path"], final_kwargs["live_url"]):
+        remove(final_kwargs["out_dir_path"])
+        sys.exit(1)
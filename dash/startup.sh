@@ -2,4 +2,10 @@
 
 cd /dash
 /usr/local/bin/pip install -r requirements.txt
-gunicorn -b 0.0.0.0:80 app:server
\ No newline at end of file
+
+# Render the static pages for nginx, then check them against gunicorn once
+# it is up. Pages that do not match are removed and served by gunicorn.
+python prerender.py --o /static_pages
+python prerender.py --o /static_pages --v http://localhost:80 &
+
+gunicorn -c gunicorn.conf.py app:server
\ No newline at end of file
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+forecast_dir = "../data/forecasts"
+
+
+def current_forecast_dir():
+    # The data version published by the updater (updater/publish.py), or
+    # the forecast directory itself before anything has been published
+    current_dir = f"{forecast_dir}/current"
+    return current_dir if os.path.isdir(current_dir) else forecast_dir
+
+
+class SeriesStore:
+    """
+    Arrays of one data version written by the updater (updater/store.py).
+
+    The arrays are memory mapped read only, so every gunicorn worker shares
+    the same page cache instead of holding its own unpickled copy, and the
+    DataFrames handed out are views onto them.
+    """
+
+    def __init__(self, version_dir):
+
+        self.version_dir = version_dir
+
+        store_dir = f"{version_dir}/store"
+
+        with open(f"{store_dir}/index.json") as index_file:
+            index = json.load(index_file)
+
+        self.statistics = index["statistics"]
+        self.forecast_columns = index["forecast_columns"]
+        self.series_index = index["series"]
+
+        self.history_dates = np.load(
+            f"{store_dir}/history_dates.npy", mmap_mode="r"
+        )
+        self.history_values = np.load(
+            f"{store_dir}/history_values.npy", mmap_mode="r"
+        )
+        self.forecast_dates = np.load(
+            f"{store_dir}/forecast_dates.npy", mmap_mode="r"
+        )
+        self.forecast_values = np.load(
+            f"{store_dir}/forecast_values.npy", mmap_mode="r"
+        )
+
+    def series_data(self, title):
+        # Same layout as the series pickles written by run_models
+
+        if title not in self.series_index:
+            raise FileNotFoundError(title)
+
+        series_index = self.series_index[title]
+
+        start, stop = series_index["history"]
+        series_df = pd.DataFrame(
+            self.history_values[start:stop, np.newaxis],
+            index=pd.DatetimeIndex(
+                self.history_dates[start:stop], name="date"
+            ),
+            columns=["value"],
+        )
+
+        all_forecasts = {}
+
+        for model_name, model_index in series_index["models"].items():
+            start, stop = model_index["rows"]
+            all_forecasts[model_name] = {
+                "model_description": model_index["model_description"],
+                "cv_score": model_index["cv_score"],
+                "forecast_df": pd.DataFrame(
+                    self.forecast_values[start:stop],
+                    index=pd.DatetimeIndex(self.forecast_dates[start:stop]),
+                    columns=self.forecast_columns,
+                ),
+            }
+
+        return {
+            "data_source_dict": series_index["data_source_dict"],
+            "downloaded_dict": {
+                "hashsum": series_index["hashsum"],
+                "series_df": series_df,
+                "downloaded_at": datetime.fromisoformat(
+                    series_index["downloaded_at"]
+                ),
+            },
+            "forecasted_at": datetime.fromisoformat(
+                series_index["forecasted_at"]
+            ),
+            "all_forecasts": all_forecasts,
+        }
+
+
+# Replaced when the updater publishes a new version. Requests that already
+# hold the old store or DataFrames built from it keep its maps alive, and
+# they are unmapped when the last of those references goes away.
+_store_state = {"version_dir": None, "store": None}
+_store_lock = threading.Lock()
+
+
+def current_store():
+    # None when the current version has no store
+
+    version_dir = os.path.realpath(current_forecast_dir())
+
+    if version_dir != _store_state["version_dir"]:
+        with _store_lock:
+            if version_dir != _store_state["version_dir"]:
+                _store_state["store"] = (
+                    SeriesStore(version_dir)
+                    if os.path.isfile(f"{version_dir}/store/index.json")
+                    else None
+                )
+                _store_state["version_dir"] = version_dir
+
+    return _store_state["store"]
@@ -1,9 +1,11 @@
 import ast
+import base64
 import os
 import re
 from functools import wraps
 from urllib.parse import urlparse, parse_qs
 
+import numpy as np
 from dash.exceptions import PreventUpdate
 
 
@@ -48,3 +50,61 @@ def apply_default_value(params):
         return apply_value
 
     return wrapper
+
+
+def encode_array(values):
+    # Little-endian float64 buffer in plotly's typed array format, decoded
+    # in the browser by assets/series.js
+    return {
+        "dtype": "f8",
+        "bdata": base64.b64encode(
+            np.ascontiguousarray(values, dtype="<f8").tobytes()
+        ).decode(),
+    }
+
+
+def datetime_to_ms(index):
+    # Plotly reads numbers on a date axis as milliseconds since the epoch
+    return index.values.astype("datetime64[ms]").astype(np.int64)
+
+
+def downsample_lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keep the first and last points and,
+    # from each bucket in between, the point forming the largest triangle
+    # with the previously kept point and the mean of the next bucket. This
+    # preserves the peaks and troughs that plain decimation would drop.
+    # Returns the indices of the kept points.
+
+    n = len(x)
+
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    edges = np.append(edges, n)
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+
+        a = start + np.argmax(area)
+        indices[i + 1] = a
+
+    return indices
@@ -0,0 +1,158 @@
+import argparse
+import json
+import pickle
+
+import numpy as np
+from models import OrderSearchModel
+from publish import current_version_path
+from run_models import (
+    TimeSeriesRollingSplit,
+    cross_val_score,
+    forecast_len,
+    level,
+    model_class_list,
+    p_to_use,
+)
+from sklearn.metrics import mean_squared_error
+
+# The Auto ARIMA model in use, R or statsmodels
+arima_class = next(
+    m for m in model_class_list if issubclass(m, OrderSearchModel)
+)
+
+
+class FullSearch(arima_class):
+    # The order search at every origin, as before order caching
+    order_search_every = 1
+
+
+def arima_results(sources_path, forecast_dir_path):
+
+    with open(sources_path) as data_sources_json_file:
+        data_sources_list = json.load(data_sources_json_file)
+
+    version_path = current_version_path(forecast_dir_path)
+
+    results = {}
+
+    for data_source_dict in data_sources_list:
+        try:
+            f = open(f"{version_path}/{data_source_dict['title']}.pkl", "rb")
+        except FileNotFoundError:
+            continue
+        series_data = pickle.load(f)
+        f.close()
+
+        arima_result = series_data["all_forecasts"].get(arima_class.name, {})
+
+        if "model_order" in arima_result:
+            results[data_source_dict["title"]] = (series_data, arima_result)
+
+    return results
+
+
+def arima_report(sources_path, forecast_dir_path, n_series):
+    """
+    How often the Auto ARIMA order changes, within a run between the
+    searches made across cross validation origins and between runs, and
+    how far the cross validation scores of order caching drift from those
+    of a search at every origin.
+    """
+
+    results = arima_results(sources_path, forecast_dir_path)
+
+    print(f"Series with cached Auto ARIMA orders: {len(results)}")
+
+    if not results:
+        return
+
+    order_dicts = [r["model_order"] for _, r in results.values()]
+
+    n_fits = sum(d["n_fits"] for d in order_dicts)
+    n_searches = sum(d["n_searches"] for d in order_dicts)
+    n_order_changes = sum(d["n_order_changes"] for d in order_dicts)
+
+    print(f"  fits: {n_fits}, order searches: {n_searches}")
+    if n_searches > len(order_dicts):
+        print(
+            "  order changed at {:.1%} of repeated searches".format(
+                n_order_changes / (n_searches - len(order_dicts))
+            )
+        )
+
+    with_previous = [d for d in order_dicts if d["previous_order"]]
+    if with_previous:
+        print(
+            "  order changed since the previous run for {:.1%} of {} series".format(
+                np.mean(
+                    [d["order"] != d["previous_order"] for d in with_previous]
+                ),
+                len(with_previous),
+            )
+        )
+
+    if n_series == 0:
+        return
+
+    cv = TimeSeriesRollingSplit(h=forecast_len, p_to_use=p_to_use)
+
+    drifts = []
+
+    for title, (series_data, arima_result) in list(results.items())[:n_series]:
+        y = series_data["downloaded_dict"]["series_df"]["value"]
+
+        full_search_score = cross_val_score(
+            FullSearch(h=forecast_len, level=level),
+            y,
+            cv,
+            mean_squared_error,
+        )
+
+        drift = arima_result["cv_score"] / full_search_score - 1
+        drifts.append(drift)
+
+        print(f"  {title}: CV score drift {drift:+.2%}")
+
+    print(
+        "  CV score drift over {} series: mean {:+.2%}, max {:+.2%}".format(
+            len(drifts), np.mean(drifts), np.max(drifts)
+        )
+    )
+
+
+if __name__ == "__main__":
+
+    args_dict = {
+        "s": {
+            "help": "sources file path",
+            "default": "../shared_config/data_sources.json",
+            "kw": "sources_path",
+        },
+        "f": {
+            "help": "forecast directory path",
+            "default": "../data/forecasts",
+            "kw": "forecast_dir_path",
+        },
+        "n": {
+            "help": "number of series to score with a search at every origin",
+            "default": "0",
+            "kw": "n_series",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    final_kwargs["n_series"] = int(final_kwargs["n_series"])
+
+    arima_report(**final_kwargs)
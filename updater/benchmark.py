@@ -0,0 +1,152 @@
+import argparse
+import json
+import random
+import threading
+import time
+
+import numpy as np
+import requests
+from index_page import index_series
+from warm_cache import (
+    dash_pages,
+    page_requests,
+    search_requests,
+    series_requests,
+)
+
+
+def request_mix(sources_path, n_series=10):
+    """
+    Requests a visitor's browser sends, in roughly the proportions of the
+    web tier's traffic: page shells and layouts, Series and Search callbacks
+    and the data API.
+    """
+
+    with open(sources_path) as data_sources_json_file:
+        data_sources_list = json.load(data_sources_json_file)
+
+    series_titles = [
+        data_source_dict["title"] for data_source_dict in data_sources_list
+    ]
+
+    mix = page_requests(dash_pages) + 4 * search_requests()
+
+    for series_title in series_titles[:n_series] + index_series():
+        mix.extend(series_requests(series_title))
+
+    mix.extend(
+        [
+            ("GET", "/api/series", None),
+            ("GET", "/api/leaderboard", None),
+        ]
+    )
+
+    return mix
+
+
+def run_client(base_url, mix, deadline, latencies, errors):
+
+    session = requests.Session()
+    random_state = random.Random()
+
+    while time.monotonic() < deadline:
+        method, path, body = random_state.choice(mix)
+
+        start = time.monotonic()
+        try:
+            response = session.request(
+                method,
+                base_url + path,
+                data=body.encode() if body is not None else None,
+                headers={"Content-Type": "application/json"}
+                if body is not None
+                else {},
+                timeout=300,
+            )
+            ok = response.status_code in [200, 204]
+        except requests.RequestException:
+            ok = False
+
+        if ok:
+            latencies.append(time.monotonic() - start)
+        else:
+            errors.append(path)
+
+
+def benchmark(base_url, sources_path, n_clients, duration):
+
+    mix = request_mix(sources_path)
+
+    latencies = []
+    errors = []
+
+    deadline = time.monotonic() + duration
+
+    clients = [
+        threading.Thread(
+            target=run_client,
+            args=(base_url, mix, deadline, latencies, errors),
+        )
+        for _ in range(n_clients)
+    ]
+
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    latencies_ms = np.array(latencies) * 1000
+
+    print(f"{base_url} with {n_clients} clients for {duration}s")
+    print(f"  requests: {len(latencies)}, errors: {len(errors)}")
+    print(f"  throughput: {len(latencies) / duration:.1f} req/s")
+    if len(latencies_ms):
+        print(
+            "  latency ms: p50 {:.0f}, p95 {:.0f}, p99 {:.0f}".format(
+                *np.percentile(latencies_ms, [50, 95, 99])
+            )
+        )
+
+
+if __name__ == "__main__":
+
+    args_dict = {
+        "u": {
+            "help": "server to benchmark",
+            "default": "http://gunicorn",
+            "kw": "base_url",
+        },
+        "s": {
+            "help": "sources file path",
+            "default": "../shared_config/data_sources.json",
+            "kw": "sources_path",
+        },
+        "c": {
+            "help": "number of concurrent clients",
+            "default": "16",
+            "kw": "n_clients",
+        },
+        "t": {
+            "help": "duration in seconds",
+            "default": "30",
+            "kw": "duration",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    final_kwargs["n_clients"] = int(final_kwargs["n_clients"])
+    final_kwargs["duration"] = float(final_kwargs["duration"])
+
+    benchmark(**final_kwargs)
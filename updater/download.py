@@ -8,6 +8,7 @@ from hashlib import sha256
 import numpy as np
 import pandas as pd
 import requests
+from index_page import index_series
 from requests.exceptions import HTTPError
 
 
@@ -22,6 +23,19 @@ class DataSource(ABC):
         self.frequency = frequency
         self.tags = tags
 
+        # Saved along with the series, for the next download
+        self.download_info = {}
+
+    def previous_download(self):
+        # The data saved by the last fetch, if any
+        try:
+            f = open(f"{self.download_path}/{self.title}.pkl", "rb")
+        except FileNotFoundError:
+            return None
+        data = pickle.load(f)
+        f.close()
+        return data
+
     def fetch(self):
         print(self.title)
         series_df = self.download()
@@ -33,6 +47,7 @@ class DataSource(ABC):
             "hashsum": hashsum,
             "series_df": series_df,
             "downloaded_at": datetime.datetime.now(),
+            **self.download_info,
         }
 
         f = open(f"{self.download_path}/{self.title}.pkl", "wb")
@@ -62,7 +77,14 @@ class Fred(DataSource):
     # Thanks to https://github.com/mortada/fredapi/blob/master/fredapi/fred.py
     # and https://realpython.com/python-requests/
 
-    def download(self):
+    # Only observations from revision_window before the last stored one are
+    # requested, and merged into the stored series. The whole history is
+    # downloaded again every full_download_every, for benchmark revisions
+    # that reach further back.
+    revision_window = pd.DateOffset(years=3)
+    full_download_every = datetime.timedelta(days=28)
+
+    def observations(self, observation_start=None):
 
         api_key_file = "../shared_config/fred_api_key"
         with open(api_key_file, "r") as kf:
@@ -74,6 +96,11 @@ class Fred(DataSource):
 
         payload = {"api_key": api_key, "file_type": "json"}
 
+        if observation_start is not None:
+            payload["observation_start"] = observation_start.strftime(
+                "%Y-%m-%d"
+            )
+
         try:
             response = requests.get(self.url, params=payload)
 
@@ -86,7 +113,7 @@ class Fred(DataSource):
 
         data = response.json()
 
-        df = pd.DataFrame(data["observations"])[["date", "value"]]
+        df = pd.DataFrame(data["observations"], columns=["date", "value"])
 
         # Set index
         df["date"] = pd.to_datetime(df["date"])
@@ -98,6 +125,48 @@ class Fred(DataSource):
 
         return df
 
+    def download(self):
+
+        now = datetime.datetime.now()
+
+        previous = self.previous_download()
+
+        if (
+            previous is None
+            or previous.get("url") != self.url
+            or previous.get("full_downloaded_at") is None
+            or now - previous["full_downloaded_at"] > self.full_download_every
+            or len(previous["series_df"]) == 0
+        ):
+            self.download_info = {"url": self.url, "full_downloaded_at": now}
+            return self.observations()
+
+        self.download_info = {
+            "url": self.url,
+            "full_downloaded_at": previous["full_downloaded_at"],
+        }
+
+        stored_df = previous["series_df"]
+        observation_start = stored_df.index[-1] - self.revision_window
+
+        window_df = self.observations(observation_start)
+
+        # Observations in the window that changed or went away
+        stored_window = stored_df.loc[stored_df.index >= observation_start]
+        common = stored_window.index.intersection(window_df.index)
+        n_revised = int(
+            (
+                stored_window.loc[common, "value"]
+                != window_df.loc[common, "value"]
+            ).sum()
+        ) + len(stored_window.index.difference(window_df.index))
+        if n_revised:
+            print(f"  - {n_revised} observations revised")
+
+        return pd.concat(
+            [stored_df.loc[stored_df.index < observation_start], window_df]
+        )
+
 
 class Ons(DataSource):
     def download(self):
@@ -143,13 +212,23 @@ class Ons(DataSource):
         return df
 
 
-def download_data(sources_path, download_path):
+def source_priority(data_source_dict):
+    # Series with lower numbers are downloaded, forecast and published
+    # first. The series featured on the Index page come first unless a
+    # "priority" is given in data_sources.json.
+    if "priority" in data_source_dict:
+        return int(data_source_dict["priority"])
+    return 0 if data_source_dict["title"] in index_series() else 1
+
+
+def download_series(sources_path, download_path):
+    # Yield the title of each series as soon as its download is saved
 
     with open(sources_path) as data_sources_json_file:
 
         data_sources_list = json.load(data_sources_json_file)
 
-        for data_source_dict in data_sources_list:
+        for data_source_dict in sorted(data_sources_list, key=source_priority):
 
             all_source_classes = {
                 "AusMacroData": AusMacroData,
@@ -158,12 +237,21 @@ def download_data(sources_path, download_path):
             }
 
             source_class = all_source_classes[data_source_dict.pop("source")]
+            data_source_dict.pop("priority", None)
             data_source_dict["download_path"] = download_path
 
             source = source_class(**data_source_dict)
 
             source.fetch()
 
+            yield source.title
+
+
+def download_data(sources_path, download_path):
+
+    for _ in download_series(sources_path, download_path):
+        pass
+
 
 if __name__ == "__main__":
     download_data("../shared_config/data_sources.json", "../data/downloads")
@@ -0,0 +1,148 @@
+import argparse
+import gzip
+import json
+import os
+import pickle
+
+import pandas as pd
+from run_models import level, select_best_model
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+export_columns = (
+    ["title", "model", "is_best", "cv_score", "date", "forecast"]
+    + [f"LB_{lv}" for lv in level]
+    + [f"UB_{lv}" for lv in level]
+)
+
+# Every series is cast to this, so that one with other dtypes or with
+# missing values cannot stop the Parquet export partway
+if pa is not None:
+    export_schema = pa.schema(
+        [
+            ("title", pa.string()),
+            ("model", pa.string()),
+            ("is_best", pa.bool_()),
+            ("cv_score", pa.float64()),
+            ("date", pa.timestamp("ns")),
+        ]
+        + [(column, pa.float64()) for column in export_columns[5:]]
+    )
+
+
+def series_export_df(series_data):
+    # One row per (model, date) of a single series
+
+    best_model = select_best_model(series_data["all_forecasts"])
+
+    model_dfs = []
+
+    for model_name, forecast_dict in series_data["all_forecasts"].items():
+        if "forecast_df" not in forecast_dict:
+            continue
+
+        model_df = forecast_dict["forecast_df"].copy()
+        model_df.index.name = "date"
+        model_df = model_df.reset_index()
+
+        model_df.insert(0, "title", series_data["data_source_dict"]["title"])
+        model_df.insert(1, "model", model_name)
+        model_df.insert(2, "is_best", model_name == best_model)
+        model_df.insert(3, "cv_score", forecast_dict["cv_score"])
+
+        model_dfs.append(model_df)
+
+    return pd.concat(model_dfs).reindex(columns=export_columns)
+
+
+def iter_series_exports(sources_path, forecast_dir_path):
+    # Load one series at a time so memory stays flat with catalogue size
+
+    with open(sources_path) as data_sources_json_file:
+        data_sources_list = json.load(data_sources_json_file)
+
+    for data_source_dict in data_sources_list:
+
+        try:
+            f = open(
+                f"{forecast_dir_path}/{data_source_dict['title']}.pkl", "rb"
+            )
+        except FileNotFoundError:
+            continue
+
+        series_data = pickle.load(f)
+        f.close()
+
+        yield series_export_df(series_data)
+
+
+def export_forecasts(sources_path, forecast_dir_path):
+
+    csv_path = f"{forecast_dir_path}/export.csv.gz"
+    parquet_path = f"{forecast_dir_path}/export.parquet"
+
+    # Written under temporary names and moved into place at the end, so the
+    # web tier never serves a partial export
+    csv_file = gzip.open(f"{csv_path}.tmp", "wt", newline="")
+    csv_file.write(",".join(export_columns) + "\n")
+
+    parquet_writer = None
+
+    for export_df in iter_series_exports(sources_path, forecast_dir_path):
+
+        export_df.to_csv(csv_file, header=False, index=False)
+
+        if pa is not None:
+            table = pa.Table.from_pandas(
+                export_df, schema=export_schema, preserve_index=False
+            )
+            if parquet_writer is None:
+                parquet_writer = pq.ParquetWriter(
+                    f"{parquet_path}.tmp", export_schema, compression="zstd"
+                )
+            # One row group per series
+            parquet_writer.write_table(table)
+
+    csv_file.close()
+    os.replace(f"{csv_path}.tmp", csv_path)
+
+    if parquet_writer is not None:
+        parquet_writer.close()
+        os.replace(f"{parquet_path}.tmp", parquet_path)
+    elif pa is None:
+        print("pyarrow is not installed, skipping Parquet export")
+
+
+if __name__ == "__main__":
+
+    args_dict = {
+        "s": {
+            "help": "sources file path",
+            "default": "../shared_config/data_sources.json",
+            "kw": "sources_path",
+        },
+        "f": {
+            "help": "forecast directory path",
+            "default": "../data/forecasts",
+            "kw": "forecast_dir_path",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    export_forecasts(**final_kwargs)
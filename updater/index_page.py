@@ -0,0 +1,15 @@
+import json
+
+
+def index_series(index_page_path="../shared_config/index_page.json"):
+    # Series with thumbnails on the home page (see pages.Index in the web
+    # app, which reads the same file), in the order they appear
+
+    with open(index_page_path) as index_page_json_file:
+        index_page = json.load(index_page_json_file)
+
+    titles = [index_page["featured"], index_page["leaderboard"]]
+    for series_titles in index_page["snapshots"].values():
+        titles.extend(series_titles)
+
+    return list(dict.fromkeys(titles))
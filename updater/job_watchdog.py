@@ -0,0 +1,235 @@
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection, wait
+from multiprocessing.reduction import recv_handle, send_handle
+
+# Seconds between checks of the running jobs
+poll_interval = 1
+
+
+def process_memory(pid):
+    # Resident memory of a process in bytes
+    with open(f"/proc/{pid}/statm") as statm_file:
+        return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def feed_queue(iterable, maxsize):
+    """
+    Put the items of iterable on a queue of at most maxsize items from a
+    thread, followed by None. Returns the queue and a list that receives
+    any exception raised by iterable.
+    """
+
+    item_queue = queue.Queue(maxsize=maxsize)
+    errors = []
+
+    def feed():
+        try:
+            for item in iterable:
+                item_queue.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            item_queue.put(None)
+
+    threading.Thread(target=feed, daemon=True).start()
+
+    return item_queue, errors
+
+
+def worker_loop(func, conn):
+
+    while True:
+        key, args = conn.recv()
+        try:
+            conn.send((key, "done", func(args)))
+        except Exception as e:
+            conn.send((key, "error", e))
+
+
+def forker_loop(func, conn):
+    # Forks a worker for every request and sends back its pid and its end
+    # of the worker's pipe. Exited workers are reaped by the kernel.
+
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    while conn.recv():
+        parent_conn, worker_conn = Pipe()
+
+        pid = os.fork()
+
+        if pid == 0:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            conn.close()
+            parent_conn.close()
+            try:
+                worker_loop(func, worker_conn)
+            finally:
+                os._exit(0)
+
+        worker_conn.close()
+
+        conn.send(pid)
+        send_handle(conn, parent_conn.fileno(), None)
+        parent_conn.close()
+
+
+def start_forker(func):
+
+    parent_conn, forker_conn = Pipe()
+
+    process = Process(
+        target=forker_loop, args=(func, forker_conn), daemon=True
+    )
+    process.start()
+
+    forker_conn.close()
+
+    return {"process": process, "conn": parent_conn}
+
+
+def stop_forker(forker):
+
+    forker["process"].kill()
+    forker["process"].join()
+    forker["conn"].close()
+
+
+def start_worker(forker):
+
+    forker["conn"].send(True)
+
+    pid = forker["conn"].recv()
+    conn = Connection(recv_handle(forker["conn"]))
+
+    return {"pid": pid, "conn": conn, "key": None}
+
+
+def worker_alive(worker):
+    return os.path.exists(f"/proc/{worker['pid']}")
+
+
+def stop_worker(worker):
+
+    try:
+        os.kill(worker["pid"], signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    worker["conn"].close()
+
+
+def run_jobs(func, jobs, n_workers, timeout=None, memory_limit=None):
+    """
+    Run func(args) for every (key, args) of jobs in n_workers processes and
+    yield (key, status, result) as each one finishes. status is "done", or
+    "timeout", "memory" or "died" with a result of None.
+
+    jobs is iterated in a thread, at most n_workers jobs ahead of the
+    workers, so it can be a generator that waits for data to be ready.
+
+    A job running for longer than timeout seconds, or whose worker holds
+    more than memory_limit bytes, is stopped by killing its worker, which
+    is replaced by a new one. This also stops R code, which does not
+    return to Python to handle signals. Exceptions raised by func are
+    raised again here.
+    """
+
+    queue_done = False
+
+    # Every worker, including those that replace stopped ones, is forked
+    # from the forker, which is forked before the thread that iterates jobs
+    # starts. A worker forked from this process while that thread runs
+    # could inherit a lock the thread holds as it plans jobs (a library's,
+    # logging's, stdout's) and wait on it forever.
+    forker = start_forker(func)
+
+    workers = [start_worker(forker) for _ in range(n_workers)]
+
+    job_queue, job_errors = feed_queue(jobs, n_workers)
+
+    try:
+        while True:
+            for worker in workers:
+                if worker["key"] is not None or queue_done:
+                    continue
+
+                # Wait for jobs only when no worker is busy
+                try:
+                    job = job_queue.get(
+                        timeout=poll_interval
+                        if all(w["key"] is None for w in workers)
+                        else 0.001
+                    )
+                except queue.Empty:
+                    break
+
+                if job is None:
+                    if job_errors:
+                        raise job_errors[0]
+                    queue_done = True
+                    break
+
+                worker["key"], args = job
+                worker["started"] = time.monotonic()
+                worker["conn"].send((worker["key"], args))
+
+            busy_conns = {
+                worker["conn"]: worker
+                for worker in workers
+                if worker["key"] is not None
+            }
+
+            if not busy_conns:
+                if queue_done:
+                    break
+                continue
+
+            for conn in wait(list(busy_conns.keys()), timeout=poll_interval):
+                worker = busy_conns[conn]
+
+                try:
+                    key, status, result = conn.recv()
+                except EOFError:
+                    # The worker died, it is replaced below
+                    continue
+
+                worker["key"] = None
+
+                if status == "error":
+                    raise result
+
+                yield key, status, result
+
+            for i, worker in enumerate(workers):
+                if worker["key"] is None:
+                    continue
+
+                if not worker_alive(worker):
+                    status = "died"
+                elif (
+                    timeout is not None
+                    and time.monotonic() - worker["started"] > timeout
+                ):
+                    status = "timeout"
+                elif (
+                    memory_limit is not None
+                    and process_memory(worker["pid"]) > memory_limit
+                ):
+                    status = "memory"
+                else:
+                    continue
+
+                key = worker["key"]
+
+                stop_worker(worker)
+                workers[i] = start_worker(forker)
+
+                yield key, status, None
+    finally:
+        for worker in workers:
+            stop_worker(worker)
+        stop_forker(forker)
@@ -1,7 +1,16 @@
+import inspect
+import warnings
 from abc import ABC
 from abc import abstractmethod
+from multiprocessing import Pool, cpu_count, current_process
 
+import numpy as np
+import pandas as pd
+from seasonal import seasonal_factors, seasonal_indices
 from sklearn.base import BaseEstimator
+from statsmodels.tsa.exponential_smoothing.ets import ETSModel, ETSResults
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from statsmodels.tsa.stattools import kpss
 
 
 class ForecastModel(BaseEstimator, ABC):
@@ -28,6 +37,100 @@ class ForecastModel(BaseEstimator, ABC):
         pass
 
 
+# Models of the M4 benchmarks that forecast the seasonally adjusted series
+# and multiply the forecasts back by the seasonal indices. run_models
+# computes the indices once per series and training window and passes them
+# to fit() as seasonal_indices_by_length.
+class SeasonallyAdjustedModel(ForecastModel, ABC):
+    def fit(self, y, seasonal_indices_by_length=None):
+
+        if (
+            seasonal_indices_by_length is not None
+            and len(y) in seasonal_indices_by_length
+        ):
+            indices = seasonal_indices_by_length[len(y)]
+        else:
+            indices = seasonal_indices(y)
+
+        self.seasonal_out = seasonal_factors(indices, len(y), self.h)
+
+        super().fit(y / seasonal_factors(indices, 0, len(y)))
+
+    def predict(self):
+        return np.asarray(super().predict()) * self.seasonal_out
+
+    def predict_withci(self):
+        return {
+            k: np.asarray(v) * self.seasonal_out
+            for k, v in super().predict_withci().items()
+        }
+
+
+# Models that search for a model order and can refit the coefficients of a
+# known order much faster. The search is run at the first fit and then
+# every order_search_every fits, and the fits in between reuse the last
+# order found. fit(search=True) searches regardless, which run_models does
+# for the final fit on the whole series. run_models passes the order the
+# previous run chose for the series to fit() as previous_order and keeps the
+# one chosen by this run.
+class OrderSearchModel(ForecastModel, ABC):
+
+    # 1 searches at every fit, 0 only at the first one, which for cross
+    # validation is the latest origin
+    order_search_every = 0
+
+    # What fit() does with previous_order: "start" starts the first search
+    # from it, "fixed" uses it in place of the first search
+    previous_order_use = "start"
+
+    def __init__(self, h=1, level=[]):
+
+        super().__init__(h, level)
+
+        self.order = None
+        self.n_fits = 0
+        self.n_searches = 0
+        self.n_order_changes = 0
+
+    @abstractmethod
+    def search_order(self, y, start_order):
+        # Fit the best order found from start_order (which may be None)
+        # and return that order
+        pass
+
+    @abstractmethod
+    def fit_order(self, y, order):
+        # Fit the coefficients of order and return the order fitted
+        pass
+
+    def fit(self, y, previous_order=None, search=False):
+
+        if (
+            self.order is None
+            and previous_order is not None
+            and type(self).previous_order_use == "fixed"
+        ):
+            self.order = list(previous_order)
+
+        k = type(self).order_search_every
+
+        if (
+            search
+            or self.order is None
+            or (k > 0 and self.n_fits > 0 and self.n_fits % k == 0)
+        ):
+            order = self.search_order(y, self.order or previous_order)
+            self.n_searches += 1
+        else:
+            order = self.fit_order(y, self.order)
+
+        if self.order is not None and order != self.order:
+            self.n_order_changes += 1
+
+        self.order = order
+        self.n_fits += 1
+
+
 class RModel(ForecastModel, ABC):
     @property
     @staticmethod
@@ -108,7 +211,12 @@ class RModel(ForecastModel, ABC):
 class RDirectForecastModel(RModel):
     def get_r_forecast_dict(self):
         return dict(
-            self.forecast_func(y=self.y, h=self.h, level=self.r_level).items()
+            self.forecast_func(
+                y=self.y,
+                h=self.h,
+                level=self.r_level,
+                **type(self).forecast_model_params,
+            ).items()
         )
 
     def fit(self, y):
@@ -145,15 +253,18 @@ class RNaive(RDirectForecastModel):
     r_forecast_model_name = "naive"
 
 
-class RNaive2(RDirectForecastModel):
+class RNaive2(SeasonallyAdjustedModel, RDirectForecastModel):
     name = "Seasonally Adjusted Naive"
 
-    r_forecast_lib = "seasadj.R"
+    r_forecast_lib = "forecast"
+
+    r_forecast_model_name = "naive"
 
-    r_forecast_model_name = "naive2"
+    def description(self):
+        return "Seasonally Adjusted Naive"
 
 
-class RTheta(RDirectForecastModel):
+class RTheta(SeasonallyAdjustedModel, RDirectForecastModel):
     name = "Theta"
 
     r_forecast_lib = "forecast"
@@ -191,17 +302,438 @@ class RDamped(RForecastModel):
     forecast_model_params = {"model": "ZZN", "damped": True}
 
 
-class RAutoARIMA(RForecastModel):
+# (p, d, q, P, D, Q, period, include mean, include drift) of a model
+# fitted by forecast::auto.arima or forecast::Arima
+r_arima_order = """
+function(fit) {
+    coef_names <- names(coef(fit))
+    as.integer(c(
+        fit$arma[c(1, 6, 2, 3, 7, 4, 5)],
+        "intercept" %in% coef_names,
+        "drift" %in% coef_names
+    ))
+}
+"""
+
+
+# Members of the M4 Comb benchmark: SES, Holt and damped Holt of the
+# seasonally adjusted series
+class RSimple2(SeasonallyAdjustedModel, RDirectForecastModel):
+    name = "Seasonally Adjusted SES"
+
+    r_forecast_lib = "forecast"
+
+    r_forecast_model_name = "ses"
+
+
+class RHolt2(SeasonallyAdjustedModel, RDirectForecastModel):
+    name = "Seasonally Adjusted Holt"
+
+    r_forecast_lib = "forecast"
+
+    r_forecast_model_name = "holt"
+
+    forecast_model_params = {"damped": False}
+
+
+class RDamped2(SeasonallyAdjustedModel, RDirectForecastModel):
+    name = "Seasonally Adjusted Damped Holt"
+
+    r_forecast_lib = "forecast"
+
+    r_forecast_model_name = "holt"
+
+    forecast_model_params = {"damped": True}
+
+
+class RAutoARIMA(OrderSearchModel, RForecastModel):
     name = "Auto ARIMA"
 
     r_forecast_lib = "forecast"
 
     r_forecast_model_name = "auto_arima"
 
+    def __init__(self, h=1, level=[]):
+
+        super().__init__(h, level)
+
+        import rpy2.robjects as robjects
+
+        self.r_arima_order = robjects.r(r_arima_order)
+
+    def search_order(self, y, start_order):
+
+        start_params = {}
+        if start_order is not None:
+            p, d, q, P, D, Q = start_order[:6]
+            start_params = {
+                "start_p": p,
+                "start_q": q,
+                "start_P": P,
+                "start_Q": Q,
+            }
+
+        self.fit_results = self.forecast_func(y=y, **start_params)
+
+        return [int(x) for x in self.r_arima_order(self.fit_results)]
+
+    def fit_order(self, y, order):
+
+        import rpy2.robjects as robjects
+        from rpy2.rinterface_lib.embedded import RRuntimeError
+
+        p, d, q, P, D, Q, period, include_mean, include_drift = order
+
+        try:
+            self.fit_results = self.forecast_lib.Arima(
+                y=y,
+                order=robjects.IntVector([p, d, q]),
+                seasonal=robjects.ListVector(
+                    {"order": robjects.IntVector([P, D, Q]), "period": period}
+                ),
+                include_mean=bool(include_mean),
+                include_drift=bool(include_drift),
+            )
+        except RRuntimeError:
+            # The order no longer fits this window, e.g. the coefficients
+            # are non-stationary
+            self.n_searches += 1
+            return self.search_order(y, order)
+
+        return order
+
+    def fit(self, y, previous_order=None, search=False):
+
+        super().fit(y, previous_order, search)
+
+        RModel.fit(self, y)
+
+
+# statsmodels 0.15 renamed the seed argument of simulations
+simulate_seed_keyword = (
+    "rng"
+    if "rng" in inspect.signature(ETSResults.simulate).parameters
+    else "random_state"
+)
+
+
+# Models estimated in Python with statsmodels rather than R. Each one has
+# the name of the R model it replaces and can be used in its place in
+# run_models.model_class_list. Worker processes that only run these never
+# start R.
+class SMETSModel(ForecastModel):
+
+    # Components as in the model string of forecast::ets. "Z" selects by
+    # AICc, between additive and multiplicative errors or between no and
+    # additive trend. damped None tries both, as forecast::ets does.
+    error = "Z"
+    trend = "N"
+    damped = None
+
+    def candidates(self, values):
+
+        errors = {
+            "A": ["add"],
+            "M": ["mul"],
+            # Multiplicative errors need positive data
+            "Z": ["add", "mul"] if np.all(values > 0) else ["add"],
+        }[type(self).error]
+
+        trends = {"N": [None], "A": ["add"], "Z": [None, "add"]}[
+            type(self).trend
+        ]
+
+        dampeds = {None: [False, True], False: [False], True: [True]}[
+            type(self).damped
+        ]
+
+        # Only a trend can be damped, and as in forecast::ets a damped model
+        # always has one
+        return [
+            (error, trend, damped)
+            for error in errors
+            for trend in trends
+            for damped in dampeds
+            if trend or not damped
+        ]
+
+    def description(self):
+        return self.method
+
+    def fit(self, y):
+
+        # The prediction intervals of statsmodels need a pandas index
+        endog = pd.Series(np.asarray(y, dtype=np.float64))
+
+        fits = []
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for error, trend, damped in self.candidates(endog.to_numpy()):
+                fit_results = ETSModel(
+                    endog, error=error, trend=trend, damped_trend=damped
+                ).fit(disp=False)
+                fits.append(((error, trend, damped), fit_results))
+
+        aiccs = [fit_results.aicc for _, fit_results in fits]
+        (error, trend, damped), self.fit_results = fits[
+            int(np.argmin(np.nan_to_num(aiccs, nan=np.inf)))
+        ]
+
+        self.method = "ETS({},{},N)".format(
+            error[0].upper(),
+            ("A" + ("d" if damped else "")) if trend else "N",
+        )
+
+    def predict(self):
+        return np.asarray(self.fit_results.forecast(self.h))
+
+    def predict_withci(self):
+
+        n = self.fit_results.nobs
+
+        # Intervals of multiplicative models are simulated, with a fixed
+        # seed so that reruns give the same forecasts
+        prediction = self.fit_results.get_prediction(
+            start=n,
+            end=n + self.h - 1,
+            **{simulate_seed_keyword: np.random.RandomState(0)},
+        )
+
+        forecast_dict = {"forecast": np.asarray(prediction.predicted_mean)}
+
+        for level in self.level:
+            frame = prediction.summary_frame(alpha=1 - level / 100)
+            forecast_dict[f"LB_{level}"] = frame["pi_lower"].to_numpy()
+            forecast_dict[f"UB_{level}"] = frame["pi_upper"].to_numpy()
+
+        return forecast_dict
+
+
+class SMSimple(SMETSModel):
+    name = "Simple Exponential Smoothing (ZNN)"
+
+    trend = "N"
+
+
+class SMHolt(SMETSModel):
+    name = "Holt-Winters (ZNN)"
+
+    trend = "Z"
+
+
+class SMDamped(SMETSModel):
+    name = "Damped (ZZN, Damped)"
+
+    trend = "Z"
+
+    damped = True
+
+
+class SMSimple2(SeasonallyAdjustedModel, SMETSModel):
+    name = "Seasonally Adjusted SES"
+
+    error = "A"
+
+    trend = "N"
+
+    damped = False
+
+
+class SMHolt2(SeasonallyAdjustedModel, SMETSModel):
+    name = "Seasonally Adjusted Holt"
+
+    error = "A"
+
+    trend = "A"
+
+    damped = False
+
+
+class SMDamped2(SeasonallyAdjustedModel, SMETSModel):
+    name = "Seasonally Adjusted Damped Holt"
+
+    error = "A"
+
+    trend = "A"
+
+    damped = True
+
+
+def fit_sarimax(endog, order):
+    # order has the layout of r_arima_order
+
+    p, d, q, P, D, Q, period, include_mean, include_drift = order
+
+    # The trend of SARIMAX applies to the differenced series, so a constant
+    # is a mean when d is 0 and a drift when d is 1
+    return SARIMAX(
+        endog,
+        order=(p, d, q),
+        seasonal_order=(P, D, Q, period) if period > 1 else (0, 0, 0, 0),
+        trend="c" if include_mean or include_drift else "n",
+    ).fit(disp=False)
+
+
+def sarimax_aicc(endog, order):
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            aicc = fit_sarimax(endog, order).aicc
+        except (np.linalg.LinAlgError, ValueError):
+            return np.inf
+
+    return aicc if np.isfinite(aicc) else np.inf
+
+
+class SMAutoARIMA(OrderSearchModel):
+    name = "Auto ARIMA"
+
+    max_p = 3
+    max_q = 3
+    max_d = 2
+
+    # Processes fitting the candidate orders of a search. None uses every
+    # core, except inside the worker processes of run_models, which
+    # already run one job per core.
+    n_jobs = None
+
+    def description(self):
+        return self.method
+
+    def ndiffs(self, values):
+        # Differences needed for the KPSS test to accept stationarity at
+        # the 5% level, as forecast::ndiffs
+
+        d = 0
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            while (
+                d < type(self).max_d
+                and len(values) - d > 3
+                and kpss(np.diff(values, n=d), regression="c", nlags="auto")[1]
+                < 0.05
+            ):
+                d += 1
+
+        return d
+
+    def candidate_orders(self, values, start_order):
+
+        d = self.ndiffs(values)
+
+        if start_order is None:
+            ps = range(type(self).max_p + 1)
+            qs = range(type(self).max_q + 1)
+        else:
+            # Only the neighbours of the previous order
+            p, q = start_order[0], start_order[2]
+            ps = range(max(p - 1, 0), min(p + 1, type(self).max_p) + 1)
+            qs = range(max(q - 1, 0), min(q + 1, type(self).max_q) + 1)
+
+        constants = [0, 1] if d < 2 else [0]
+
+        return [
+            [p, d, q, 0, 0, 0, 1, int(c and d == 0), int(c and d == 1)]
+            for p in ps
+            for q in qs
+            for c in constants
+        ]
+
+    def search_order(self, y, start_order):
+
+        endog = np.asarray(y, dtype=np.float64)
+
+        orders = self.candidate_orders(endog, start_order)
+
+        n_jobs = type(self).n_jobs
+        if n_jobs is None:
+            n_jobs = 1 if current_process().daemon else cpu_count()
+
+        if n_jobs > 1:
+            with Pool(min(n_jobs, len(orders))) as pool:
+                aiccs = pool.starmap(
+                    sarimax_aicc, [(endog, order) for order in orders]
+                )
+        else:
+            aiccs = [sarimax_aicc(endog, order) for order in orders]
+
+        return self.fit_order(y, orders[int(np.argmin(aiccs))])
+
+    def fit_order(self, y, order):
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.fit_results = fit_sarimax(
+                np.asarray(y, dtype=np.float64), order
+            )
+
+        p, d, q, P, D, Q, period, include_mean, include_drift = order
+
+        self.method = f"ARIMA({p},{d},{q})"
+        if include_drift:
+            self.method += " with drift"
+        elif include_mean:
+            self.method += " with non-zero mean"
+
+        return order
+
+    def predict(self):
+        return np.asarray(self.fit_results.forecast(self.h))
+
+    def predict_withci(self):
+
+        prediction = self.fit_results.get_forecast(self.h)
+
+        forecast_dict = {"forecast": np.asarray(prediction.predicted_mean)}
+
+        for level in self.level:
+            interval = np.asarray(prediction.conf_int(alpha=1 - level / 100))
+            forecast_dict[f"LB_{level}"] = interval[:, 0]
+            forecast_dict[f"UB_{level}"] = interval[:, 1]
+
+        return forecast_dict
+
+
+# Models computed from the forecasts of other models in the same run, with
+# no fitting of their own. run_models combines the members' forecasts at
+# every cross validation origin and for the final forecast. members are
+# model names, matched against run_models.model_class_list and, for members
+# that are not shown, run_models.member_class_list.
+class CombinationModel(ABC):
+    @property
+    @staticmethod
+    @abstractmethod
+    def name():
+        pass
+
+    @property
+    @staticmethod
+    @abstractmethod
+    def members():
+        pass
+
+    @property
+    @staticmethod
+    @abstractmethod
+    def model_description():
+        pass
+
+    @staticmethod
+    def combine(member_forecasts, member_cv_scores):
+        # member_forecasts has the members along its first axis
+        return np.mean(member_forecasts, axis=0)
+
 
-class RComb(RDirectForecastModel):
+class Comb(CombinationModel):
     name = "Combination M4 Benchmark"
 
-    r_forecast_lib = "seasadj.R"
+    members = [
+        "Seasonally Adjusted SES",
+        "Seasonally Adjusted Holt",
+        "Seasonally Adjusted Damped Holt",
+    ]
 
-    r_forecast_model_name = "comb"
+    model_description = "Comb"
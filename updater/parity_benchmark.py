@@ -0,0 +1,179 @@
+import argparse
+import time
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+from models import (
+    RAutoARIMA,
+    RDamped,
+    RHolt,
+    RSimple,
+    SMAutoARIMA,
+    SMDamped,
+    SMHolt,
+    SMSimple,
+)
+from run_models import (
+    TimeSeriesRollingSplit,
+    fit_model,
+    forecast_len,
+    level,
+    p_to_use,
+)
+
+model_pairs = [
+    (RSimple, SMSimple),
+    (RHolt, SMHolt),
+    (RDamped, SMDamped),
+    (RAutoARIMA, SMAutoARIMA),
+]
+
+
+def synthetic_catalogue(n_series, seed=0):
+    """
+    Quarterly series of the kinds the site forecasts: levels that wander,
+    with and without drift, mean reverting rates and positive trending
+    indices. The same seed always gives the same catalogue.
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    kinds = ["random walk", "drift", "ar1", "trend"]
+
+    catalogue = []
+
+    for i in range(n_series):
+        kind = kinds[i % len(kinds)]
+        n = random_state.randint(40, 200)
+        noise = random_state.normal(size=n)
+
+        if kind == "random walk":
+            values = 10 + np.cumsum(noise)
+        elif kind == "drift":
+            values = 10 + np.cumsum(0.3 + noise)
+        elif kind == "ar1":
+            values = np.zeros(n)
+            for t in range(1, n):
+                values[t] = 0.7 * values[t - 1] + noise[t]
+            values += 2
+        else:
+            values = 100 + np.arange(n) * 0.5 + np.cumsum(noise) + noise
+
+        catalogue.append(
+            (
+                f"{kind} {i}",
+                pd.Series(
+                    values,
+                    index=pd.date_range("1970-01-01", periods=n, freq="Q"),
+                ),
+            )
+        )
+
+    return catalogue
+
+
+def first_forecast(model_class, y):
+    model = model_class(h=forecast_len, level=level)
+    model.fit(y)
+    model.predict()
+
+
+def startup_seconds(model_class, y):
+    # Time to the first forecast of a new worker process. It is spawned
+    # rather than forked, so it starts from a fresh interpreter, and pays
+    # for the imports and for starting R as a run_models worker does.
+    start = time.monotonic()
+    with get_context("spawn").Pool(1) as pool:
+        pool.apply(first_forecast, (model_class, y))
+    return time.monotonic() - start
+
+
+def run_model(model_class, y, cv):
+    # What run_models.run_job does for one series
+
+    model = model_class(h=forecast_len, level=level)
+
+    start = time.monotonic()
+
+    _, cv_score = fit_model(model, y, cv)
+    forecast = np.asarray(model.predict_withci()["forecast"])
+
+    return time.monotonic() - start, cv_score, forecast
+
+
+def parity_benchmark(n_series):
+
+    catalogue = synthetic_catalogue(n_series)
+
+    cv = TimeSeriesRollingSplit(h=forecast_len, p_to_use=p_to_use)
+
+    for r_class, sm_class in model_pairs:
+
+        print(r_class.name)
+
+        for model_class in [r_class, sm_class]:
+            seconds = startup_seconds(model_class, catalogue[0][1])
+            print(f"  {model_class.__name__} worker startup: {seconds:.2f}s")
+
+        r_seconds = 0
+        sm_seconds = 0
+        forecast_differences = []
+        cv_score_ratios = []
+
+        for title, y in catalogue:
+            r_time, r_cv_score, r_forecast = run_model(r_class, y, cv)
+            sm_time, sm_cv_score, sm_forecast = run_model(sm_class, y, cv)
+
+            r_seconds += r_time
+            sm_seconds += sm_time
+
+            # Relative to the spread of the series
+            forecast_differences.append(
+                np.mean(np.abs(sm_forecast - r_forecast)) / np.std(y)
+            )
+            cv_score_ratios.append(sm_cv_score / r_cv_score)
+
+        print(
+            f"  time: R {r_seconds:.1f}s, statsmodels {sm_seconds:.1f}s "
+            f"({r_seconds / sm_seconds:.1f}x)"
+        )
+        print(
+            "  forecast difference / series std: "
+            "median {:.3f}, max {:.3f}".format(
+                np.median(forecast_differences), np.max(forecast_differences)
+            )
+        )
+        print(
+            "  CV score statsmodels / R: median {:.3f}, max {:.3f}".format(
+                np.median(cv_score_ratios), np.max(cv_score_ratios)
+            )
+        )
+
+
+if __name__ == "__main__":
+
+    args_dict = {
+        "n": {
+            "help": "number of synthetic series",
+            "default": "24",
+            "kw": "n_series",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    final_kwargs["n_series"] = int(final_kwargs["n_series"])
+
+    parity_benchmark(**final_kwargs)
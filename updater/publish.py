@@ -0,0 +1,244 @@
+import argparse
+import datetime
+import os
+import shutil
+import time
+
+# Published versions kept on disk for rollback, besides the current one
+n_versions_kept = 3
+
+
+def current_version_path(forecast_dir_path):
+    # Before the first publication everything lives in the directory itself
+    current_path = f"{forecast_dir_path}/current"
+    return current_path if os.path.isdir(current_path) else forecast_dir_path
+
+
+def new_version(forecast_dir_path):
+    """
+    Create an empty staging directory for the next data version.
+
+    Nothing reads it until publish_version points `current` at it.
+    """
+
+    # Versions started within the same second wait for the next one
+    while True:
+        version = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+        version_dir_path = f"{forecast_dir_path}/versions/{version}"
+
+        if not os.path.exists(version_dir_path):
+            break
+        time.sleep(1)
+
+    os.makedirs(version_dir_path)
+
+    return version_dir_path
+
+
+def unpublished_version(forecast_dir_path):
+    """
+    Staging directory of a run that stopped before publishing, or None.
+
+    Staging directories keep the job results of run_models until
+    publish_version removes them. Partial versions published during the
+    run never have any.
+    """
+
+    versions_path = f"{forecast_dir_path}/versions"
+
+    if not os.path.isdir(versions_path):
+        return None
+
+    for version in sorted(os.listdir(versions_path), reverse=True):
+        if os.path.isdir(f"{versions_path}/{version}/jobs"):
+            return f"{versions_path}/{version}"
+
+    return None
+
+
+def partial_version(forecast_dir_path, version_dir_path, titles):
+    """
+    A new version with the series pickles, statistics and manifest that
+    run_models has written so far to the staging directory
+    version_dir_path for titles, and the current version's pickles of
+    every other series.
+
+    The current version's files are hard linked, since published versions
+    are never written to again. The staging files are copied, since
+    run_models rewrites some of them.
+    """
+
+    partial_dir_path = new_version(forecast_dir_path)
+    current_path = current_version_path(forecast_dir_path)
+
+    # Names the run the version is part of
+    with open(f"{partial_dir_path}/partial", "w") as f:
+        f.write(os.path.basename(version_dir_path))
+
+    for file_name in os.listdir(current_path):
+        if file_name.endswith(".pkl") and os.path.isfile(
+            f"{current_path}/{file_name}"
+        ):
+            os.link(
+                f"{current_path}/{file_name}",
+                f"{partial_dir_path}/{file_name}",
+            )
+
+    for file_name in [f"{title}.pkl" for title in titles] + [
+        "statistics.pkl",
+        "changes.json",
+    ]:
+        if os.path.exists(f"{partial_dir_path}/{file_name}"):
+            os.remove(f"{partial_dir_path}/{file_name}")
+        shutil.copyfile(
+            f"{version_dir_path}/{file_name}",
+            f"{partial_dir_path}/{file_name}",
+        )
+
+    return partial_dir_path
+
+
+def is_full_version(version_dir_path):
+    # Neither published part way through a run nor a staging directory
+    return not os.path.exists(
+        f"{version_dir_path}/partial"
+    ) and not os.path.isdir(f"{version_dir_path}/jobs")
+
+
+def has_full_version(forecast_dir_path):
+    """
+    Whether a run has been published in full, so that a partial version has
+    forecasts of every other series to go next to. A staging directory
+    counts only once it has been published.
+    """
+
+    versions_path = f"{forecast_dir_path}/versions"
+
+    if os.path.isdir(versions_path) and any(
+        is_full_version(f"{versions_path}/{version}")
+        and os.path.isfile(f"{versions_path}/{version}/statistics.pkl")
+        for version in os.listdir(versions_path)
+    ):
+        return True
+
+    # Forecasts written in place, before there were versions
+    return os.path.isfile(f"{forecast_dir_path}/statistics.pkl")
+
+
+def fsync_tree(dir_path):
+
+    for root, dir_names, file_names in os.walk(dir_path):
+        for file_name in file_names:
+            fd = os.open(os.path.join(root, file_name), os.O_RDONLY)
+            os.fsync(fd)
+            os.close(fd)
+
+        fd = os.open(root, os.O_RDONLY)
+        os.fsync(fd)
+        os.close(fd)
+
+
+def point_current(forecast_dir_path, version):
+
+    # Renaming a new link over the old one swaps every reader at once
+    if os.path.lexists(f"{forecast_dir_path}/current.tmp"):
+        os.remove(f"{forecast_dir_path}/current.tmp")
+    os.symlink(f"versions/{version}", f"{forecast_dir_path}/current.tmp")
+    os.replace(
+        f"{forecast_dir_path}/current.tmp", f"{forecast_dir_path}/current"
+    )
+
+    fd = os.open(forecast_dir_path, os.O_RDONLY)
+    os.fsync(fd)
+    os.close(fd)
+
+
+def publish_version(forecast_dir_path, version_dir_path):
+
+    # Job results are only needed to resume run_models
+    shutil.rmtree(f"{version_dir_path}/jobs", ignore_errors=True)
+
+    fsync_tree(version_dir_path)
+
+    version = os.path.basename(version_dir_path)
+    point_current(forecast_dir_path, version)
+
+    print(f"Published {version}")
+
+    # Versions sort by creation time. Only full versions are kept for
+    # rollback. Partial versions are removed once another version is
+    # published, and so are abandoned staging directories, except the one a
+    # run may still be writing to or resume from.
+    staging_dir_path = unpublished_version(forecast_dir_path)
+
+    versions = sorted(os.listdir(f"{forecast_dir_path}/versions"))
+    full_versions = [
+        v
+        for v in versions
+        if is_full_version(f"{forecast_dir_path}/versions/{v}")
+    ]
+    kept_versions = set(full_versions[-(n_versions_kept + 1) :])
+
+    for old_version in versions:
+        old_version_path = f"{forecast_dir_path}/versions/{old_version}"
+        if (
+            old_version not in kept_versions
+            and old_version != version
+            and old_version_path != staging_dir_path
+        ):
+            shutil.rmtree(old_version_path)
+
+
+def rollback(forecast_dir_path, version):
+
+    if not os.path.isdir(f"{forecast_dir_path}/versions/{version}"):
+        raise ValueError(f"Unknown version {version}")
+
+    point_current(forecast_dir_path, version)
+
+    print(f"Rolled back to {version}")
+
+
+if __name__ == "__main__":
+
+    args_dict = {
+        "f": {
+            "help": "forecast directory path",
+            "default": "../data/forecasts",
+            "kw": "forecast_dir_path",
+        },
+        "r": {
+            "help": "version to point current at",
+            "default": None,
+            "kw": "version",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    if final_kwargs["version"] is None:
+        versions_path = f"{final_kwargs['forecast_dir_path']}/versions"
+        print(
+            "Versions:",
+            *[
+                v if is_full_version(f"{versions_path}/{v}") else f"({v})"
+                for v in sorted(os.listdir(versions_path))
+            ],
+        )
+        print(
+            "Current:",
+            os.readlink(f"{final_kwargs['forecast_dir_path']}/current"),
+        )
+    else:
+        rollback(**final_kwargs)
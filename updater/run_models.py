@@ -3,11 +3,18 @@ import datetime
 import json
 import os.path
 import pickle
-from multiprocessing import Pool, cpu_count
+import shutil
+from hashlib import sha256
+from multiprocessing import cpu_count
 
 import numpy as np
 import pandas as pd
+from download import source_priority
+from job_watchdog import run_jobs
 from models import (
+    CombinationModel,
+    OrderSearchModel,
+    SeasonallyAdjustedModel,
     RNaive,
     RAutoARIMA,
     RSimple,
@@ -15,15 +22,35 @@ from models import (
     RDamped,
     RTheta,
     RNaive2,
-    RComb,
+    RSimple2,
+    RHolt2,
+    RDamped2,
+    Comb,
 )
+from seasonal import preprocess_series
 from sklearn.metrics import mean_squared_error
 from sklearn.utils.validation import indexable, _num_samples
+from work_queue import run_queued_jobs
 
 p_to_use = 1
 forecast_len = 8
 level = [50, 75, 95]
 
+# Limits of every model job. A job that exceeds either is stopped and its
+# series keeps the previous result of that model, if there is one.
+job_timeout = 30 * 60
+job_memory_limit = 4 * 1024**3
+
+# Where the jobs run. None runs them in worker processes on this host. The
+# path of a SQLite database on a volume shared with other hosts queues them
+# for the workers started there with `python work_queue.py --q <path>`, as
+# well as for work_queue_local_workers on this host.
+work_queue_path = None
+work_queue_local_workers = cpu_count()
+
+# The R models Auto ARIMA, Simple, Holt and Damped can be swapped for the
+# statsmodels models of the same name: SMAutoARIMA, SMSimple, SMHolt and
+# SMDamped
 model_class_list = [
     RNaive,
     RAutoARIMA,  # RAutoARIMA is very slow!
@@ -32,9 +59,34 @@ model_class_list = [
     RDamped,
     RTheta,
     RNaive2,
-    RComb,
+    Comb,
 ]
 
+# Members of the combinations above that are not shown themselves. They run
+# as jobs of their own and their results are kept with the series, apart
+# from all_forecasts. The statsmodels SMSimple2, SMHolt2 and SMDamped2 can be
+# used in their place.
+member_class_list = [RSimple2, RHolt2, RDamped2]
+
+
+def planned_models():
+    # The models shown, then the members of their combinations that are not
+
+    shown_names = [m.name for m in model_class_list]
+
+    member_names = [
+        name
+        for m in model_class_list
+        if issubclass(m, CombinationModel)
+        for name in m.members
+    ]
+
+    return model_class_list + [
+        m
+        for m in member_class_list
+        if m.name in member_names and m.name not in shown_names
+    ]
+
 
 def forecast_to_df(
     data_source_dict,
@@ -111,22 +163,39 @@ class TimeSeriesRollingSplit:
             yield (indices[:position], indices[position : position + h])
 
 
-def cross_val_score(model, y, cv, scorer, fit_params={}):
+def cross_val_forecasts(model, y, cv, fit_params={}):
+    # Point forecasts at every origin, one row per split of cv
 
-    errors = []
+    forecasts = []
 
     for train_index, test_index in cv.split(y):
-        y_train, y_test = y[train_index], y[test_index]
+        y_train = y[train_index]
 
         model.fit(y_train, **fit_params)
 
-        model_predictions = model.predict()
+        forecasts.append(np.asarray(model.predict(), dtype=np.float64))
+
+    return np.array(forecasts)
+
 
-        errors.append(scorer(y_test, model_predictions))
+def cross_val_score_forecasts(y, cv, scorer, forecasts):
+
+    errors = []
+
+    for (train_index, test_index), model_predictions in zip(
+        cv.split(y), forecasts
+    ):
+        errors.append(scorer(y[test_index], model_predictions))
 
     return np.mean(errors)
 
 
+def cross_val_score(model, y, cv, scorer, fit_params={}):
+    return cross_val_score_forecasts(
+        y, cv, scorer, cross_val_forecasts(model, y, cv, fit_params)
+    )
+
+
 # Short-circuit forecasting if hashsums match
 def check_cache(download_pickle, cache_pickle):
 
@@ -156,6 +225,105 @@ def check_cache(download_pickle, cache_pickle):
     return downloaded_dict, None
 
 
+def select_best_model(all_forecasts):
+
+    model_names = list(all_forecasts.keys())
+    cv_scores = [all_forecasts[m]["cv_score"] for m in model_names]
+
+    return model_names[np.argmin(cv_scores)]
+
+
+def previous_best_model(cache_pickle):
+
+    if not os.path.isfile(cache_pickle):
+        return None
+
+    f = open(cache_pickle, "rb")
+    cache_dict = pickle.load(f)
+    f.close()
+
+    return select_best_model(cache_dict["all_forecasts"])
+
+
+def previous_result(cache_pickle, model_name):
+    # Kept even when the series has changed
+
+    if not os.path.isfile(cache_pickle):
+        return None
+
+    f = open(cache_pickle, "rb")
+    cache_dict = pickle.load(f)
+    f.close()
+
+    return cache_dict["all_forecasts"].get(
+        model_name, cache_dict.get("member_forecasts", {}).get(model_name)
+    )
+
+
+def previous_model_order(cache_pickle, model_name):
+    # Order chosen by the last run
+
+    result = previous_result(cache_pickle, model_name) or {}
+
+    return result.get("model_order", {}).get("order")
+
+
+def write_changes(forecast_dir_path, changes):
+
+    f = open(f"{forecast_dir_path}/changes.json", "w")
+    json.dump(changes, f, indent=2)
+    f.close()
+
+
+def job_result_path(forecast_dir_path, title, model_name, hashsum):
+    # Results of earlier data for the same series are never picked up
+    job_key = sha256(
+        json.dumps([title, model_name, hashsum]).encode()
+    ).hexdigest()
+    return f"{forecast_dir_path}/jobs/{job_key}.pkl"
+
+
+def write_job_result(result_path, result):
+
+    # Written under another name first, so that a job interrupted while
+    # writing is not taken for a completed one
+    f = open(f"{result_path}.tmp", "wb")
+    pickle.dump(result, f)
+    f.close()
+
+    os.replace(f"{result_path}.tmp", result_path)
+
+
+def read_job_result(result_path):
+
+    f = open(result_path, "rb")
+    result = pickle.load(f)
+    f.close()
+
+    return result
+
+
+def fit_model(model, y, cv, fit_params={}):
+    """
+    Cross validate model on y, then fit it on the whole series for the
+    forecast. Returns the forecasts at every origin and the CV score.
+    """
+
+    cv_forecasts = cross_val_forecasts(model, y, cv, fit_params=fit_params)
+    cv_score = cross_val_score_forecasts(
+        y, cv, mean_squared_error, cv_forecasts
+    )
+
+    # The forecast is made with an order searched for on the whole series,
+    # starting from the last one cross validation used
+    if isinstance(model, OrderSearchModel):
+        fit_params = {**fit_params, "search": True}
+
+    model.fit(y, **fit_params)
+
+    return cv_forecasts, cv_score
+
+
 def run_job(job_dict, cv, model_params):
 
     print(f"{job_dict['title']} - {job_dict['model_cls']}")
@@ -166,9 +334,16 @@ def run_job(job_dict, cv, model_params):
 
     model = job_dict["model_cls"](**model_params)
 
-    cv_score = cross_val_score(model, y, cv, mean_squared_error)
+    fit_params = {}
+    if "seasonal_indices_by_length" in job_dict:
+        fit_params["seasonal_indices_by_length"] = job_dict[
+            "seasonal_indices_by_length"
+        ]
+    if job_dict.get("previous_order") is not None:
+        fit_params["previous_order"] = job_dict["previous_order"]
 
-    model.fit(y)
+    # Kept with the result so that combinations can be scored from them
+    cv_forecasts, cv_score = fit_model(model, y, cv, fit_params)
 
     forecast_dict = model.predict_withci()
 
@@ -188,110 +363,578 @@ def run_job(job_dict, cv, model_params):
         "model_description": model.description(),
         "cv_score": cv_score,
         "forecast_df": forecast_df,
+        "cv_forecasts": cv_forecasts,
     }
 
+    # Read by the next run and by arima_report
+    if isinstance(model, OrderSearchModel):
+        result["model_order"] = {
+            "order": model.order,
+            "previous_order": job_dict.get("previous_order"),
+            "n_fits": model.n_fits,
+            "n_searches": model.n_searches,
+            "n_order_changes": model.n_order_changes,
+        }
+
     return job_dict, result
 
 
-def run_models(sources_path, download_dir_path, forecast_dir_path):
+def run_job_args(args):
+    return run_job(*args)
 
-    # Save statistics
-    print("Generating Statistics")
-    data = {"models_used": [m.name for m in model_class_list]}
 
-    f = open(f"{forecast_dir_path}/statistics.pkl", "wb")
-    pickle.dump(data, f)
+def combine_forecasts(model_class, series_data, cv):
+
+    member_results = [
+        series_data["all_forecasts"][name] for name in model_class.members
+    ]
+    member_cv_scores = np.array([r["cv_score"] for r in member_results])
+
+    cv_forecasts = model_class.combine(
+        np.array([r["cv_forecasts"] for r in member_results]),
+        member_cv_scores,
+    )
+
+    # Point forecasts and every interval bound are combined alike
+    first_forecast_df = member_results[0]["forecast_df"]
+    forecast_df = pd.DataFrame(
+        model_class.combine(
+            np.array(
+                [
+                    r["forecast_df"]
+                    .reindex(columns=first_forecast_df.columns)
+                    .to_numpy()
+                    for r in member_results
+                ]
+            ),
+            member_cv_scores,
+        ),
+        index=first_forecast_df.index,
+        columns=first_forecast_df.columns,
+    )
+
+    return {
+        "model_description": model_class.model_description,
+        "cv_score": cross_val_score_forecasts(
+            series_data["downloaded_dict"]["series_df"]["value"],
+            cv,
+            mean_squared_error,
+            cv_forecasts,
+        ),
+        "forecast_df": forecast_df,
+        "cv_forecasts": cv_forecasts,
+    }
+
+
+def assemble_series(
+    series_data, forecast_dir_path, cache_dir_path, cv, stopped_jobs
+):
+    """
+    Fill in the results of a series computed by its jobs and write its
+    pickle. Returns the best model of the series, or None when every job
+    was stopped with no previous result to fall back on, in which case no
+    pickle is written.
+    """
+
+    series_title = series_data["data_source_dict"]["title"]
+    all_forecasts = series_data["all_forecasts"]
+
+    models = planned_models()
+
+    for model_class in models:
+        if all_forecasts[model_class.name] or issubclass(
+            model_class, CombinationModel
+        ):
+            continue
+
+        if (series_title, model_class.name) not in stopped_jobs:
+            all_forecasts[model_class.name] = read_job_result(
+                job_result_path(
+                    forecast_dir_path,
+                    series_title,
+                    model_class.name,
+                    series_data["downloaded_dict"]["hashsum"],
+                )
+            )
+
+    # Combinations from the results of their members, with no fitting
+    for model_class in model_class_list:
+        if (
+            issubclass(model_class, CombinationModel)
+            and not all_forecasts[model_class.name]
+        ):
+            if any(
+                (series_title, name) in stopped_jobs
+                or all_forecasts[name].get("fallback")
+                for name in model_class.members
+            ):
+                stopped_jobs[(series_title, model_class.name)] = "members"
+            else:
+                all_forecasts[model_class.name] = combine_forecasts(
+                    model_class, series_data, cv
+                )
+
+    # Stopped jobs keep the previous result of their model, or the model
+    # is left out for the series
+    for model_class in models:
+        if (series_title, model_class.name) in stopped_jobs:
+            result = previous_result(
+                f"{cache_dir_path}/{series_title}.pkl", model_class.name
+            )
+            if result is None:
+                del all_forecasts[model_class.name]
+            else:
+                all_forecasts[model_class.name] = {**result, "fallback": True}
+
+    # Members that are not shown are kept apart, for the next run
+    series_data["member_forecasts"] = {
+        m.name: all_forecasts.pop(m.name)
+        for m in models[len(model_class_list) :]
+        if m.name in all_forecasts
+    }
+
+    if not all_forecasts:
+        print(f"{series_title} - no results, left out")
+        return None
+
+    f = open(f"{forecast_dir_path}/{series_title}.pkl", "wb")
+    pickle.dump(series_data, f)
     f.close()
 
-    with open(sources_path) as data_sources_json_file:
+    return select_best_model(all_forecasts)
 
-        data_sources_list = json.load(data_sources_json_file)
 
-    # Results storage
-    series_dict = {}
+def plan_series(
+    data_source_dict, download_dir_path, forecast_dir_path, cache_dir_path, cv
+):
+    """
+    The series data of a source with its cached results, the jobs that
+    compute the others, and whether any are computed.
+    """
 
-    job_list = []
+    print(data_source_dict["title"])
 
-    # Parse JSON and cache
-    for data_source_dict in data_sources_list:
+    downloaded_dict, cache_dict = check_cache(
+        f"{download_dir_path}/{data_source_dict['title']}.pkl",
+        f"{cache_dir_path}/{data_source_dict['title']}.pkl",
+    )
 
-        print(data_source_dict["title"])
+    # Read local pickle that we created earlier
+    series_df = downloaded_dict["series_df"]
 
-        downloaded_dict, cache_dict = check_cache(
-            f"{download_dir_path}/{data_source_dict['title']}.pkl",
-            f"{forecast_dir_path}/{data_source_dict['title']}.pkl",
-        )
+    # Hack to align to the end of the quarter
+    if data_source_dict["frequency"] == "Q":
+        offset = pd.offsets.QuarterEnd()
+        series_df.index = series_df.index + offset
 
-        # Read local pickle that we created earlier
-        series_df = downloaded_dict["series_df"]
+    all_forecasts = {}
 
-        # Hack to align to the end of the quarter
-        if data_source_dict["frequency"] == "Q":
-            offset = pd.offsets.QuarterEnd()
-            series_df.index = series_df.index + offset
+    cached_forecasts = (
+        {
+            **cache_dict.get("member_forecasts", {}),
+            **cache_dict["all_forecasts"],
+        }
+        if cache_dict
+        else {}
+    )
 
-        all_forecasts = {}
+    models = planned_models()
 
-        for model_class in model_class_list:
+    # Results kept from an earlier run because their job was stopped are
+    # computed again
+    to_compute = set(
+        m
+        for m in models
+        if m.name not in cached_forecasts
+        or cached_forecasts[m.name].get("fallback")
+    )
 
-            model_name = model_class.name
+    recomputed = cache_dict is None or bool(to_compute)
 
-            # Use cached results
-            if cache_dict and model_name in cache_dict["all_forecasts"]:
-                cached_forecasts = cache_dict["all_forecasts"]
-                result = cached_forecasts[model_name]
+    # A combination needs the forecasts of its members at every origin,
+    # which older results do not have, and is computed again whenever any
+    # of its members is
+    for model_class in models:
+        if issubclass(model_class, CombinationModel):
+            members = [m for m in models if m.name in model_class.members]
 
-            else:
-                # Add to job list
-                job_list.append(
-                    {
-                        "title": data_source_dict["title"],
-                        "model_cls": model_class,
-                        "data_source_dict": data_source_dict,
-                        "downloaded_dict": downloaded_dict,
-                    }
+            if model_class in to_compute:
+                to_compute.update(
+                    m
+                    for m in members
+                    if "cv_forecasts" not in cached_forecasts.get(m.name, {})
                 )
 
-                # Temporarily set result to empty
-                result = {}
+            if any(m in to_compute for m in members):
+                to_compute.add(model_class)
 
-            all_forecasts[model_name] = result
+    job_list = []
 
-        series_dict[data_source_dict["title"]] = {
-            "data_source_dict": data_source_dict,
-            "downloaded_dict": downloaded_dict,
-            "forecasted_at": datetime.datetime.now(),
-            "all_forecasts": all_forecasts,
-        }
+    for model_class in models:
+
+        model_name = model_class.name
+
+        # Use cached results
+        if model_class not in to_compute:
+            result = cached_forecasts[model_name]
+
+        else:
+            # Combinations are computed once their members are done
+            if not issubclass(model_class, CombinationModel):
+                job_dict = {
+                    "title": data_source_dict["title"],
+                    "model_cls": model_class,
+                    "data_source_dict": data_source_dict,
+                    "downloaded_dict": downloaded_dict,
+                    "result_path": job_result_path(
+                        forecast_dir_path,
+                        data_source_dict["title"],
+                        model_name,
+                        downloaded_dict["hashsum"],
+                    ),
+                }
+
+                if issubclass(model_class, OrderSearchModel):
+                    job_dict["previous_order"] = previous_model_order(
+                        f"{cache_dir_path}/{data_source_dict['title']}.pkl",
+                        model_name,
+                    )
+
+                # Add to job list
+                job_list.append(job_dict)
+
+            # Temporarily set result to empty
+            result = {}
+
+        all_forecasts[model_name] = result
+
+    # Seasonal indices of every training window, computed once per series
+    # and shared by all of its seasonally adjusted models
+    if any(
+        issubclass(job_dict["model_cls"], SeasonallyAdjustedModel)
+        for job_dict in job_list
+    ):
+        seasonal_indices_by_length = preprocess_series(series_df["value"], cv)
+
+        for job_dict in job_list:
+            if issubclass(job_dict["model_cls"], SeasonallyAdjustedModel):
+                job_dict[
+                    "seasonal_indices_by_length"
+                ] = seasonal_indices_by_length
+
+    series_data = {
+        "data_source_dict": data_source_dict,
+        "downloaded_dict": downloaded_dict,
+        # Unchanged series keep their timestamp so that their pages do not
+        # need to be invalidated
+        "forecasted_at": datetime.datetime.now()
+        if recomputed
+        else cache_dict["forecasted_at"],
+        "all_forecasts": all_forecasts,
+    }
+
+    return series_data, job_list, recomputed
+
+
+def run_models(
+    sources_path,
+    download_dir_path,
+    forecast_dir_path,
+    cache_dir_path=None,
+    resume=False,
+    downloads=None,
+    on_priority_done=None,
+    queue_path=None,
+):
+    """
+    Forecast every series in sources_path with every model.
+
+    downloads, e.g. download.download_series, yields the title of each
+    series once its data is in download_dir_path, so that its models run
+    while the rest download. By default all of them already are.
+
+    on_priority_done is called with the titles of the series done so far
+    when every series of a priority class (see download.source_priority)
+    but the last is done, unless none of them changed. forecast_dir_path
+    then holds their pickles and a statistics and manifest for them, which
+    can be published ahead of the rest.
+
+    queue_path overrides work_queue_path.
+    """
+
+    # Previous results are read from cache_dir_path and every output is
+    # written to forecast_dir_path, which may be a fresh staging directory
+    if cache_dir_path is None:
+        cache_dir_path = forecast_dir_path
+
+    # The result of every job is saved under forecast_dir_path/jobs as soon
+    # as it finishes. A resumed run skips the jobs saved by an interrupted
+    # run on the same data.
+    jobs_dir_path = f"{forecast_dir_path}/jobs"
+    if not resume:
+        shutil.rmtree(jobs_dir_path, ignore_errors=True)
+    os.makedirs(jobs_dir_path, exist_ok=True)
+
+    # Save statistics
+    print("Generating Statistics")
+    data = {"models_used": [m.name for m in model_class_list]}
+
+    previous_models_used = None
+    previous_data_hash = None
+    if os.path.isfile(f"{cache_dir_path}/statistics.pkl"):
+        f = open(f"{cache_dir_path}/statistics.pkl", "rb")
+        previous_data = pickle.load(f)
+        f.close()
+        previous_models_used = previous_data["models_used"]
+        previous_data_hash = previous_data.get("data_hash")
+
+    f = open(f"{forecast_dir_path}/statistics.pkl", "wb")
+    pickle.dump(data, f)
+    f.close()
+
+    with open(sources_path) as data_sources_json_file:
+
+        data_sources_list = json.load(data_sources_json_file)
+
+    data_sources = {
+        data_source_dict["title"]: data_source_dict
+        for data_source_dict in data_sources_list
+    }
+
+    if downloads is None:
+        downloads = sorted(
+            data_sources.keys(),
+            key=lambda title: source_priority(data_sources[title]),
+        )
+
+    # Every priority class but the last can be published before the rest
+    # of the run is done
+    titles_by_priority = {}
+    for title, data_source_dict in data_sources.items():
+        titles_by_priority.setdefault(
+            source_priority(data_source_dict), []
+        ).append(title)
+
+    early_priorities = (
+        sorted(titles_by_priority.keys())[:-1]
+        if on_priority_done is not None
+        else []
+    )
+
+    # Results storage
+    series_dict = {}
+
+    # Best model of each recomputed series before this run, used to tell
+    # the web cache which aggregate pages need refreshing
+    previous_best_models = {}
 
     cv = TimeSeriesRollingSplit(h=forecast_len, p_to_use=p_to_use)
     model_params = {"h": forecast_len, "level": level}
 
-    pool = Pool(cpu_count())
+    jobs = {}
+    jobs_left = {}
+    resumed_jobs = []
 
-    results = pool.starmap(
-        run_job, [[job_dict, cv, model_params] for job_dict in job_list]
-    )
+    def plan_jobs():
+        # Jobs of every series, as soon as its download is ready
 
-    # Insert results of jobs into dictionary
-    for result in results:
+        for title in downloads:
 
-        series_title = result[0]["title"]
+            series_data, job_list, recomputed = plan_series(
+                data_sources[title],
+                download_dir_path,
+                forecast_dir_path,
+                cache_dir_path,
+                cv,
+            )
 
-        model_name = result[0]["model_cls"].name
+            if recomputed:
+                previous_best_models[title] = previous_best_model(
+                    f"{cache_dir_path}/{title}.pkl"
+                )
 
-        series_dict[series_title]["all_forecasts"][model_name] = result[1]
+            job_list_left = []
+            for job_dict in job_list:
+                if os.path.isfile(job_dict["result_path"]):
+                    resumed_jobs.append(job_dict)
+                else:
+                    job_list_left.append(job_dict)
+
+            # The series is assembled once none of its jobs are left
+            jobs_left[title] = len(job_list_left)
+            series_dict[title] = series_data
+
+            for job_dict in job_list_left:
+                jobs[job_dict["result_path"]] = job_dict
+                yield job_dict["result_path"], [
+                    job_dict,
+                    cv,
+                    model_params,
+                ]
+
+    # Series are planned while the workers run the jobs planned so far.
+    # Planning, and the downloads behind it, wait when the workers fall
+    # behind. Series are planned in priority order, so their jobs run in
+    # that order too.
+    stopped_jobs = {}
+
+    best_models = {}
+
+    # What each series in the version was forecast from, and when. A series
+    # gets a new forecasted_at whenever any of its models is computed again,
+    # e.g. after a stopped job.
+    series_versions = {}
+
+    # Series with no result at all to publish
+    left_out_series = set()
+
+    def write_run_outputs(titles, data_hash):
+        # Manifest and statistics of the series in titles
+
+        # Manifest of what this run changed, read by warm_cache
+        changes = {
+            "forecasted_at": datetime.datetime.now().isoformat(),
+            "models_changed": previous_models_used != data["models_used"],
+            "changed_series": sorted(
+                series_title
+                for series_title in previous_best_models.keys()
+                if series_title in titles
+            ),
+            "best_model_changed": sorted(
+                series_title
+                for series_title, best_model in previous_best_models.items()
+                if series_title in titles
+                and best_model != best_models[series_title]
+            ),
+            "stopped_jobs": [
+                {"title": series_title, "model": model_name, "reason": status}
+                for (series_title, model_name), status in stopped_jobs.items()
+                if series_title in titles or series_title in left_out_series
+            ],
+        }
 
-    # Write all series pickles to disk
-    for series_title, series_data in series_dict.items():
+        write_changes(forecast_dir_path, changes)
 
-        f = open(
-            f"{forecast_dir_path}/{series_data['data_source_dict']['title']}.pkl",
-            "wb",
-        )
-        pickle.dump(series_data, f)
+        f = open(f"{forecast_dir_path}/statistics.pkl", "wb")
+        pickle.dump({**data, "data_hash": data_hash}, f)
         f.close()
 
+    def assemble_ready_series():
+
+        for series_title in list(series_dict.keys()):
+            if jobs_left[series_title] == 0:
+                series_data = series_dict.pop(series_title)
+                best_model = assemble_series(
+                    series_data,
+                    forecast_dir_path,
+                    cache_dir_path,
+                    cv,
+                    stopped_jobs,
+                )
+
+                # Not in this version, only its stopped jobs are listed
+                if best_model is None:
+                    left_out_series.add(series_title)
+                    continue
+
+                best_models[series_title] = best_model
+                series_versions[series_title] = [
+                    series_data["downloaded_dict"]["hashsum"],
+                    series_data["forecasted_at"].isoformat(),
+                    best_model,
+                ]
+
+        # Publish as soon as a priority class is done, along with whatever
+        # else is done by then
+        while early_priorities and all(
+            series_title in best_models or series_title in left_out_series
+            for series_title in titles_by_priority[early_priorities[0]]
+        ):
+            early_priorities.pop(0)
+
+            # When nothing done so far has changed, a new version would only
+            # repeat the current one, under a new data hash and ETags
+            if previous_models_used == data["models_used"] and not any(
+                series_title in previous_best_models
+                for series_title in best_models
+            ):
+                continue
+
+            # Other series are published with their previous forecasts
+            write_run_outputs(
+                set(best_models.keys()),
+                sha256(
+                    json.dumps(
+                        [
+                            data["models_used"],
+                            previous_data_hash,
+                            sorted(series_versions.items()),
+                        ]
+                    ).encode()
+                ).hexdigest(),
+            )
+
+            on_priority_done(sorted(best_models.keys()))
+
+    if queue_path is None:
+        queue_path = work_queue_path
+
+    if queue_path is None:
+        job_results = run_jobs(
+            run_job_args,
+            plan_jobs(),
+            cpu_count(),
+            timeout=job_timeout,
+            memory_limit=job_memory_limit,
+        )
+    else:
+        print(f"Queueing jobs in {queue_path}")
+        job_results = run_queued_jobs(
+            ("run_models", "run_job_args"),
+            plan_jobs(),
+            queue_path,
+            n_workers=work_queue_local_workers,
+            timeout=job_timeout,
+            memory_limit=job_memory_limit,
+        )
+
+    # Results are saved in the order the jobs finish, and not kept. Each
+    # series is assembled as soon as its last job is done.
+    for result_path, status, job_result in job_results:
+        job_dict = jobs[result_path]
+
+        if status == "done":
+            write_job_result(result_path, job_result[1])
+        else:
+            print(f"{job_dict['title']} - {job_dict['model_cls']}: {status}")
+            stopped_jobs[
+                (job_dict["title"], job_dict["model_cls"].name)
+            ] = status
+
+        jobs_left[job_dict["title"]] -= 1
+
+        assemble_ready_series()
+
+    if resumed_jobs:
+        print(f"Resumed, {len(resumed_jobs)} jobs were already done")
+
+    assemble_ready_series()
+
+    # Version of the whole data set, used by the web tier for ETags. It only
+    # changes when the list of models changes, or some series' data or
+    # forecasts do.
+    write_run_outputs(
+        set(best_models.keys()),
+        sha256(
+            json.dumps(
+                [
+                    data["models_used"],
+                    sorted(series_versions.items()),
+                ]
+            ).encode()
+        ).hexdigest(),
+    )
+
 
 if __name__ == "__main__":
 
@@ -311,6 +954,16 @@ if __name__ == "__main__":
             "default": "../data/forecasts",
             "kw": "forecast_dir_path",
         },
+        "r": {
+            "help": "resume from the jobs done by an interrupted run (1)",
+            "default": "0",
+            "kw": "resume",
+        },
+        "q": {
+            "help": "work queue database path, shared with other hosts",
+            "default": "",
+            "kw": "queue_path",
+        },
     }
 
     parser = argparse.ArgumentParser()
@@ -326,4 +979,11 @@ if __name__ == "__main__":
             input_args[k] if input_args[k] else v["default"]
         )
 
-    run_models(**final_kwargs)
+    final_kwargs["resume"] = final_kwargs["resume"] == "1"
+    final_kwargs["queue_path"] = final_kwargs["queue_path"] or None
+
+    # Run from the imported module, so that the cv objects queued for
+    # work_queue workers pickle as run_models.<name>, not __main__.<name>
+    import run_models as run_models_module
+
+    run_models_module.run_models(**final_kwargs)
@@ -0,0 +1,73 @@
+# Seasonal adjustment of the M4 Competition statistical benchmarks, shared
+# by every model that forecasts a deseasonalised series (see
+# models.SeasonallyAdjustedModel).
+# https://github.com/Mcompetitions/M4-methods/blob/master/Benchmarks%20and%20Evaluation.R
+
+import numpy as np
+from statsmodels.tsa.seasonal import seasonal_decompose
+from statsmodels.tsa.stattools import acf
+
+# Observation spacing in days and the matching periods per year
+period_days = np.array([1, 7 / 5, 30, 91, 365])
+period_lengths = [7, 5, 12, 4, 1]
+
+
+def guess_period(index):
+    # The series reach the models without a frequency, so reconstruct it
+    # from the timestamps
+    average_days = (index[-1] - index[0]).days / (len(index) - 1)
+    return period_lengths[
+        np.argmin(np.abs(np.log(average_days / period_days)))
+    ]
+
+
+def seasonality_test(values, period):
+    # Is the autocorrelation at the seasonal lag significant?
+    tcrit = 1.645
+
+    if len(values) < 3 * period:
+        return False
+
+    xacf = acf(values, nlags=period, fft=False)[1:]
+    clim = (
+        tcrit
+        / np.sqrt(len(values))
+        * np.sqrt(np.cumsum(np.concatenate([[1], 2 * xacf**2])))
+    )
+
+    return bool(np.abs(xacf[period - 1]) > clim[period - 1])
+
+
+def seasonal_indices(y):
+    """
+    Multiplicative seasonal indices of a series, one per position in the
+    seasonal cycle starting at its first observation. A single index of 1
+    when the series is not seasonal.
+    """
+
+    period = guess_period(y.index)
+    values = np.asarray(y, dtype=np.float64)
+
+    # Multiplicative decomposition is only meaningful for positive data
+    if period > 1 and np.all(values > 0) and seasonality_test(values, period):
+        return seasonal_decompose(
+            values, model="multiplicative", period=period
+        ).seasonal[:period]
+
+    return np.ones(1)
+
+
+def seasonal_factors(indices, start, n):
+    # Factors for positions start, ..., start + n - 1 of the series
+    return indices[np.arange(start, start + n) % len(indices)]
+
+
+def preprocess_series(y, cv):
+    """
+    Seasonal indices of every training window used by cross validation and
+    of the whole series, keyed by window length.
+    """
+
+    window_lengths = [len(train_index) for train_index, _ in cv.split(y)]
+
+    return {n: seasonal_indices(y.iloc[:n]) for n in window_lengths + [len(y)]}
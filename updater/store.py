@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+
+def load_pickle(path):
+    f = open(path, "rb")
+    data = pickle.load(f)
+    f.close()
+    return data
+
+
+def series_arrays(series_df):
+    return (
+        series_df.index.values.astype("datetime64[ns]"),
+        series_df["value"].to_numpy(dtype=np.float64),
+    )
+
+
+def write_store(sources_path, forecast_dir_path):
+    """
+    Write every series' history and forecasts into flat .npy arrays that
+    the web tier memory maps (dash/store.py), plus a JSON index of where
+    each series and model starts and ends in them.
+
+    The store is written into the staging directory of a data version
+    (see publish.py) and is published along with the series pickles.
+    """
+
+    statistics = load_pickle(f"{forecast_dir_path}/statistics.pkl")
+
+    store_dir_path = f"{forecast_dir_path}/store"
+
+    with open(sources_path) as data_sources_json_file:
+        data_sources_list = json.load(data_sources_json_file)
+
+    history_dates = []
+    history_values = []
+    forecast_dates = []
+    forecast_values = []
+    forecast_columns = None
+
+    n_history = 0
+    n_forecast = 0
+
+    series_index = {}
+
+    for data_source_dict in data_sources_list:
+
+        title = data_source_dict["title"]
+
+        try:
+            series_data = load_pickle(f"{forecast_dir_path}/{title}.pkl")
+        except FileNotFoundError:
+            continue
+
+        downloaded_dict = series_data["downloaded_dict"]
+
+        dates, values = series_arrays(downloaded_dict["series_df"])
+        history_dates.append(dates)
+        history_values.append(values)
+
+        models = {}
+
+        for model_name, forecast_dict in series_data["all_forecasts"].items():
+
+            forecast_df = forecast_dict["forecast_df"]
+
+            if forecast_columns is None:
+                forecast_columns = list(forecast_df.columns)
+
+            forecast_dates.append(
+                forecast_df.index.values.astype("datetime64[ns]")
+            )
+            forecast_values.append(
+                forecast_df.reindex(columns=forecast_columns).to_numpy(
+                    dtype=np.float64
+                )
+            )
+
+            models[model_name] = {
+                "model_description": forecast_dict["model_description"],
+                "cv_score": float(forecast_dict["cv_score"]),
+                "rows": [n_forecast, n_forecast + len(forecast_df)],
+            }
+
+            n_forecast += len(forecast_df)
+
+        series_index[title] = {
+            "data_source_dict": series_data["data_source_dict"],
+            "hashsum": downloaded_dict["hashsum"],
+            "downloaded_at": downloaded_dict["downloaded_at"].isoformat(),
+            "forecasted_at": series_data["forecasted_at"].isoformat(),
+            "history": [n_history, n_history + len(dates)],
+            "models": models,
+        }
+
+        n_history += len(dates)
+
+    # Built beside the final directory and renamed into place, so the
+    # store is either complete or absent
+    tmp_dir_path = f"{store_dir_path}.tmp"
+    shutil.rmtree(tmp_dir_path, ignore_errors=True)
+    os.makedirs(tmp_dir_path)
+
+    arrays = {
+        "history_dates": np.concatenate(history_dates),
+        "history_values": np.concatenate(history_values),
+        "forecast_dates": np.concatenate(forecast_dates),
+        "forecast_values": np.concatenate(forecast_values),
+    }
+
+    for name, array in arrays.items():
+        np.save(f"{tmp_dir_path}/{name}.npy", array)
+
+    with open(f"{tmp_dir_path}/index.json", "w") as index_file:
+        json.dump(
+            {
+                "statistics": statistics,
+                "forecast_columns": forecast_columns,
+                "series": series_index,
+            },
+            index_file,
+        )
+
+    shutil.rmtree(store_dir_path, ignore_errors=True)
+    os.rename(tmp_dir_path, store_dir_path)
+
+
+if __name__ == "__main__":
+
+    args_dict = {
+        "s": {
+            "help": "sources file path",
+            "default": "../shared_config/data_sources.json",
+            "kw": "sources_path",
+        },
+        "f": {
+            "help": "forecast directory path",
+            "default": "../data/forecasts",
+            "kw": "forecast_dir_path",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    write_store(**final_kwargs)
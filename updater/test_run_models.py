@@ -0,0 +1,176 @@
+import datetime
+import json
+import os
+import pickle
+import time
+
+import job_watchdog
+import numpy as np
+import pandas as pd
+import run_models
+from models import ForecastModel
+
+
+class SlowNaive(ForecastModel):
+    name = "Slow Naive"
+
+    def description(self):
+        return self.name
+
+    def predict_withci(self):
+        forecast = self.predict()
+        return {
+            "forecast": forecast,
+            **{f"LB_{lv}": forecast for lv in self.level},
+            **{f"UB_{lv}": forecast for lv in self.level},
+        }
+
+    def fit(self, y):
+        time.sleep(60)
+
+    def predict(self):
+        return np.zeros(self.h)
+
+
+class SlowMean(SlowNaive):
+    name = "Slow Mean"
+
+
+class Zero(SlowNaive):
+    name = "Zero"
+
+    def fit(self, y):
+        pass
+
+
+class Flaky(SlowNaive):
+    # Times out while slow is set, and is otherwise the best model of the
+    # linear test series
+
+    name = "Flaky"
+    slow = True
+
+    def fit(self, y):
+        if self.slow:
+            time.sleep(60)
+        self.y = y
+
+    def predict(self):
+        return self.y.iloc[-1] + np.arange(1.0, self.h + 1)
+
+
+def write_series(tmp_path, title):
+    # Sources file and download of one monthly series
+
+    sources_path = tmp_path / "data_sources.json"
+    sources_path.write_text(
+        json.dumps(
+            [
+                {
+                    "title": title,
+                    "source": "Fred",
+                    "url": "",
+                    "frequency": "MS",
+                    "tags": [],
+                }
+            ]
+        )
+    )
+
+    download_dir_path = tmp_path / "downloads"
+    download_dir_path.mkdir()
+    with open(download_dir_path / f"{title}.pkl", "wb") as f:
+        pickle.dump(
+            {
+                "hashsum": "0",
+                "series_df": pd.DataFrame(
+                    {"value": np.arange(40, dtype=np.float64)},
+                    index=pd.date_range("2000-01-01", periods=40, freq="MS"),
+                ),
+                "downloaded_at": datetime.datetime.now(),
+            },
+            f,
+        )
+
+    return sources_path, download_dir_path
+
+
+def test_series_with_every_job_stopped(tmp_path, monkeypatch):
+    # Every model of a series times out and there is no earlier result
+
+    monkeypatch.setattr(run_models, "model_class_list", [SlowNaive, SlowMean])
+    monkeypatch.setattr(run_models, "job_timeout", 0.5)
+    monkeypatch.setattr(job_watchdog, "poll_interval", 0.1)
+    # Priorities are read from the shared config relative to updater/
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    title = "Test Series"
+    sources_path, download_dir_path = write_series(tmp_path, title)
+
+    forecast_dir_path = tmp_path / "forecasts"
+    forecast_dir_path.mkdir()
+
+    run_models.run_models(
+        str(sources_path), str(download_dir_path), str(forecast_dir_path)
+    )
+
+    # Left out of the version, with its stopped jobs in the manifest
+    assert not os.path.exists(forecast_dir_path / f"{title}.pkl")
+    assert os.path.exists(forecast_dir_path / "statistics.pkl")
+
+    with open(forecast_dir_path / "changes.json") as f:
+        changes = json.load(f)
+
+    assert sorted(
+        (job["model"], job["reason"]) for job in changes["stopped_jobs"]
+    ) == [("Slow Mean", "timeout"), ("Slow Naive", "timeout")]
+
+
+def read_data_hash(forecast_dir_path):
+
+    with open(forecast_dir_path / "statistics.pkl", "rb") as f:
+        return pickle.load(f)["data_hash"]
+
+
+def test_data_hash_after_stopped_job(tmp_path, monkeypatch):
+    # A stopped job run again on the same data changes the best model, so
+    # the data hash that the API ETags are built from must change too
+
+    monkeypatch.setattr(run_models, "model_class_list", [Zero, Flaky])
+    monkeypatch.setattr(run_models, "job_timeout", 0.5)
+    monkeypatch.setattr(job_watchdog, "poll_interval", 0.1)
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    title = "Test Series"
+    sources_path, download_dir_path = write_series(tmp_path, title)
+
+    data_hashes = []
+    best_models = []
+    cache_dir_path = None
+
+    for run, slow in enumerate([True, False, False]):
+        monkeypatch.setattr(Flaky, "slow", slow)
+
+        forecast_dir_path = tmp_path / f"forecasts{run}"
+        forecast_dir_path.mkdir()
+
+        run_models.run_models(
+            str(sources_path),
+            str(download_dir_path),
+            str(forecast_dir_path),
+            cache_dir_path=cache_dir_path,
+        )
+
+        with open(forecast_dir_path / f"{title}.pkl", "rb") as f:
+            best_models.append(
+                run_models.select_best_model(pickle.load(f)["all_forecasts"])
+            )
+        data_hashes.append(read_data_hash(forecast_dir_path))
+
+        cache_dir_path = str(forecast_dir_path)
+
+    assert best_models == ["Zero", "Flaky", "Flaky"]
+
+    # Changed after the stopped job ran again, and not by an unchanged run
+    assert data_hashes[1] != data_hashes[0]
+    assert data_hashes[2] == data_hashes[1]
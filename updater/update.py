@@ -1,22 +1,77 @@
-from download import download_data
+from download import download_series
+from export import export_forecasts
+from publish import (
+    current_version_path,
+    has_full_version,
+    new_version,
+    partial_version,
+    publish_version,
+    unpublished_version,
+)
 from run_models import run_models
-import os
-import shutil
+from store import write_store
+from warm_cache import warm_cache
+
+# Everything below is written into a staging directory that only becomes
+# visible to the web tier once it is complete. The staging directory of a
+# run that did not finish is reused, along with the jobs it completed.
+version_dir_path = unpublished_version("../data/forecasts")
+resume = version_dir_path is not None
+if not resume:
+    version_dir_path = new_version("../data/forecasts")
+
+# On the first run there are no previous forecasts of the other series to
+# publish the priority series next to, so nothing goes live before the end
+publish_priority = has_full_version("../data/forecasts")
+
+
+def publish_priority_series(titles):
+    # The series of the first priority classes go live while the rest are
+    # still being forecast, next to the previous forecasts of the others
+    print("Publishing Priority Forecasts")
+
+    partial_dir_path = partial_version(
+        "../data/forecasts", version_dir_path, titles
+    )
+
+    write_store("../shared_config/data_sources.json", partial_dir_path)
+    export_forecasts("../shared_config/data_sources.json", partial_dir_path)
+    publish_version("../data/forecasts", partial_dir_path)
 
-print("Downloading Data")
-download_data("../shared_config/data_sources.json", "../data/downloads")
+    warm_cache(
+        "../shared_config/data_sources.json",
+        "../data/forecasts/current",
+        "../blog",
+    )
 
-print("Running Models")
+
+# The models of each series start as soon as its download is done, while
+# the next ones download
+print("Downloading Data and Running Models")
 run_models(
     "../shared_config/data_sources.json",
     "../data/downloads",
-    "../data/forecasts",
+    version_dir_path,
+    cache_dir_path=current_version_path("../data/forecasts"),
+    resume=resume,
+    downloads=download_series(
+        "../shared_config/data_sources.json", "../data/downloads"
+    ),
+    on_priority_done=publish_priority_series if publish_priority else None,
 )
 
-print("Clearing Cache")
-for filename in os.listdir("/nginx_cache"):
-    filepath = os.path.join("/nginx_cache", filename)
-    try:
-        shutil.rmtree(filepath)
-    except OSError:
-        os.remove(filepath)
+print("Storing Forecasts")
+write_store("../shared_config/data_sources.json", version_dir_path)
+
+print("Exporting Forecasts")
+export_forecasts("../shared_config/data_sources.json", version_dir_path)
+
+print("Publishing Forecasts")
+publish_version("../data/forecasts", version_dir_path)
+
+print("Warming Cache")
+warm_cache(
+    "../shared_config/data_sources.json",
+    "../data/forecasts/current",
+    "../blog",
+)
@@ -0,0 +1,438 @@
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+from index_page import index_series
+
+# nginx listener that always fetches from gunicorn and overwrites the cache
+# entry it proxies (see nginx/nginx.conf). Requests through it replace each
+# cached page in place, so visitors keep being served the old copy until the
+# new one has been rendered.
+warm_url = "http://cache:8080"
+
+# The browser-facing origin. dash-renderer sends window.location.href inside
+# callback bodies and nginx keys on "$request_uri|$request_body", so the
+# bodies we replay must carry the same href a visitor would.
+public_url = "https://business-forecast-lab.com"
+
+n_posts_per_page = 5
+
+dash_pages = [
+    "/",
+    "/search/",
+    "/leaderboard/",
+    "/series/",
+]
+
+# /methodology/, /about/ and the pages of /blog/ are served by nginx from
+# files rendered when gunicorn starts (dash/prerender.py), so only the blog's
+# callbacks are warmed.
+
+
+# nginx cache file headers are a few hundred bytes plus the key, and keys
+# include the callback request body.
+cache_header_size = 64 * 1024
+
+
+def dash_prop(component_id, component_property, value=None):
+    prop = {"id": component_id, "property": component_property}
+    if value is not None:
+        prop["value"] = value
+    return prop
+
+
+def callback_body(outputs, inputs, changed_prop_ids):
+    """Serialise a callback request exactly as dash-renderer does.
+
+    dash-renderer posts JSON.stringify(payload), which has no whitespace and
+    keeps insertion order. Any difference in the bytes produces a different
+    nginx cache key, which only costs a cache miss for that request.
+    """
+
+    if len(outputs) > 1:
+        output = "..{}..".format(
+            "...".join(f"{o['id']}.{o['property']}" for o in outputs)
+        )
+        outputs_value = outputs
+    else:
+        output = f"{outputs[0]['id']}.{outputs[0]['property']}"
+        outputs_value = outputs[0]
+
+    payload = {
+        "output": output,
+        "outputs": outputs_value,
+        "inputs": inputs,
+        "changedPropIds": changed_prop_ids,
+    }
+
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def series_requests(series_title):
+
+    query = urlencode({"title": series_title})
+    href = f"{public_url}/series/?{query}"
+
+    # Model and table switching happen in the browser, so the Series page
+    # makes a single callback request per series.
+    return [
+        ("GET", f"/series/?{query}", None),
+        (
+            "POST",
+            "/series/_dash-update-component",
+            callback_body(
+                [
+                    dash_prop("series_data", "data"),
+                    dash_prop("breadcrumb", "children"),
+                    dash_prop("model_selector", "options"),
+                    dash_prop("model_selector", "value"),
+                ],
+                [dash_prop("url", "href", href)],
+                ["url.href"],
+            ),
+        ),
+    ]
+
+
+def blog_requests(blog_dir_path):
+
+    post_names = sorted(
+        filename[: -len(".md")]
+        for filename in os.listdir(blog_dir_path)
+        if filename.endswith(".md")
+    )
+
+    warm_list = []
+
+    n_pages = max(1, math.ceil(len(post_names) / n_posts_per_page))
+
+    for page_int in range(1, n_pages + 1):
+        query = "" if page_int == 1 else f"?{urlencode({'page': page_int})}"
+        warm_list.append(
+            (
+                "POST",
+                "/blog/_dash-update-component",
+                callback_body(
+                    [dash_prop("body", "children")],
+                    [dash_prop("url", "href", f"{public_url}/blog/{query}")],
+                    ["url.href"],
+                ),
+            )
+        )
+
+    for post_name in post_names:
+        query = urlencode({"title": post_name})
+        url_input = dash_prop(
+            "url", "href", f"{public_url}/blog/post/?{query}"
+        )
+        for output_id, output_property in [
+            ("breadcrumb", "children"),
+            ("post", "children"),
+        ]:
+            warm_list.append(
+                (
+                    "POST",
+                    "/blog/post/_dash-update-component",
+                    callback_body(
+                        [dash_prop(output_id, output_property)],
+                        [url_input],
+                        ["url.href"],
+                    ),
+                )
+            )
+
+    return warm_list
+
+
+def page_requests(pages):
+
+    warm_list = []
+
+    for page in pages:
+        for suffix in ["", "_dash-layout", "_dash-dependencies"]:
+            warm_list.append(("GET", page + suffix, None))
+
+    return warm_list
+
+
+def warm_request(session, method, path, body):
+
+    try:
+        response = session.request(
+            method,
+            warm_url + path,
+            data=body.encode() if body is not None else None,
+            headers={"Content-Type": "application/json"}
+            if body is not None
+            else {},
+            timeout=300,
+        )
+        return response.status_code
+    except requests.RequestException:
+        return None
+
+
+def cache_keys(cache_dir_path):
+    """Map each nginx cache key to the file that stores it.
+
+    nginx writes the key in plain text on a "KEY: " line in the header of
+    every cache file, which lets us find entries without recomputing the
+    hashed file names.
+    """
+
+    keys = {}
+
+    if not os.path.isdir(cache_dir_path):
+        return keys
+
+    for dirpath, _, filenames in os.walk(cache_dir_path):
+        for filename in filenames:
+            # Skip temporary files nginx is still writing
+            if "." in filename:
+                continue
+
+            filepath = os.path.join(dirpath, filename)
+
+            try:
+                with open(filepath, "rb") as f:
+                    header = f.read(cache_header_size)
+            except OSError:
+                continue
+
+            start = header.find(b"\nKEY: ")
+            if start == -1:
+                continue
+            start += len(b"\nKEY: ")
+            end = header.find(b"\n", start)
+
+            keys[header[start:end].decode("utf-8", "replace")] = filepath
+
+    return keys
+
+
+def request_key(method, path, body):
+    return f"{path}|{body if body is not None else ''}"
+
+
+def purge_keys(cached_keys, matches, keep):
+    """Delete cached entries matching `matches` that are not in `keep`."""
+
+    n_purged = 0
+
+    for key, filepath in cached_keys.items():
+        if key in keep or not matches(key):
+            continue
+        try:
+            os.remove(filepath)
+            n_purged += 1
+        except FileNotFoundError:
+            pass
+
+    return n_purged
+
+
+def series_key_matcher(series_titles):
+
+    # Each title appears urlencoded either at the end of the request URI or
+    # inside the href of a callback body. Match on the terminator so that
+    # "US GDP" does not also purge "US GDP Growth".
+    needles = []
+    for series_title in series_titles:
+        query = urlencode({"title": series_title})
+        needles.extend([f"?{query}|", f'?{query}"'])
+
+    def matches(key):
+        return key.startswith("/series/") and any(n in key for n in needles)
+
+    return matches
+
+
+def search_requests():
+
+    return [
+        (
+            "POST",
+            "/search/_dash-update-component",
+            callback_body(
+                [dash_prop("filter_panel", "children")],
+                [dash_prop("url", "href", f"{public_url}/search/")],
+                ["url.href"],
+            ),
+        ),
+        (
+            "POST",
+            "/search/_dash-update-component",
+            callback_body(
+                [dash_prop("filter_results", "children")],
+                [
+                    dash_prop("name", "value", ""),
+                    dash_prop("tags", "value", []),
+                    dash_prop("methods", "value", []),
+                ],
+                [],
+            ),
+        ),
+    ]
+
+
+def load_changes(forecast_dir_path):
+
+    try:
+        with open(f"{forecast_dir_path}/changes.json") as changes_file:
+            return json.load(changes_file)
+    except FileNotFoundError:
+        return None
+
+
+def blog_newer_than(blog_dir_path, timestamp):
+
+    return any(
+        os.path.getmtime(os.path.join(blog_dir_path, filename)) > timestamp
+        for filename in os.listdir(blog_dir_path)
+        if filename.endswith(".md")
+    )
+
+
+def warm_cache(
+    sources_path,
+    forecast_dir_path,
+    blog_dir_path,
+    cache_dir_path="/nginx_cache",
+    n_workers=4,
+):
+
+    with open(sources_path) as data_sources_json_file:
+        data_sources_list = json.load(data_sources_json_file)
+
+    all_titles = [d["title"] for d in data_sources_list]
+
+    cached_keys = cache_keys(cache_dir_path)
+
+    changes = load_changes(forecast_dir_path)
+
+    # Without a manifest, or when the set of models changed (which shows up
+    # on every page), refresh everything.
+    full_refresh = changes is None or changes["models_changed"]
+
+    if full_refresh:
+        changed_titles = all_titles
+        best_model_changed = all_titles
+    else:
+        changed_titles = changes["changed_series"]
+        best_model_changed = changes["best_model_changed"]
+
+    warm_list = []
+
+    # Aggregate pages first: they are the most expensive to render and the
+    # most visited.
+    if full_refresh:
+        warm_list.extend(page_requests(dash_pages))
+    else:
+        index_key = request_key("GET", "/_dash-layout", None)
+        index_stale = (
+            bool(best_model_changed)
+            or bool(set(changed_titles) & set(index_series()))
+            or index_key not in cached_keys
+            or blog_newer_than(
+                blog_dir_path, os.path.getmtime(cached_keys[index_key])
+            )
+        )
+        if index_stale:
+            warm_list.extend(page_requests(["/"]))
+        if best_model_changed:
+            warm_list.extend(page_requests(["/leaderboard/"]))
+
+    # Search results embed thumbnails of arbitrary sets of series and are
+    # keyed on the filter values, so they cannot be refreshed one by one.
+    if changed_titles:
+        warm_list.extend(search_requests())
+
+    for series_title in changed_titles:
+        warm_list.extend(series_requests(series_title))
+
+    warm_list.extend(blog_requests(blog_dir_path))
+
+    print(
+        f"Warming {len(warm_list)} cache entries "
+        f"for {len(changed_titles)} changed series"
+    )
+
+    session = requests.Session()
+
+    # Bounded concurrency so that warming does not starve gunicorn of
+    # workers for real visitors.
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        status_codes = list(
+            executor.map(
+                lambda request: warm_request(session, *request), warm_list
+            )
+        )
+
+    n_failed = sum(1 for s in status_codes if s is None or s >= 500)
+
+    print(f"Warmed {len(warm_list) - n_failed}, failed {n_failed}")
+
+    # Drop any remaining variants of the changed entries that warming did
+    # not overwrite, e.g. callback bodies from other interaction orders.
+    warmed_keys = set(request_key(*request) for request in warm_list)
+    series_matches = series_key_matcher(changed_titles)
+
+    # API responses are cheap to regenerate and clients poll them with
+    # conditional requests, so drop them all whenever anything changed.
+    aggregate_prefixes = ("/search/_dash-update-component|", "/api/")
+
+    n_purged = purge_keys(
+        cached_keys,
+        lambda key: series_matches(key)
+        or (bool(changed_titles) and key.startswith(aggregate_prefixes)),
+        warmed_keys,
+    )
+
+    print(f"Purged {n_purged} stale cache entries")
+
+    return status_codes
+
+
+if __name__ == "__main__":
+
+    args_dict = {
+        "s": {
+            "help": "sources file path",
+            "default": "../shared_config/data_sources.json",
+            "kw": "sources_path",
+        },
+        "f": {
+            "help": "forecast directory path",
+            "default": "../data/forecasts",
+            "kw": "forecast_dir_path",
+        },
+        "b": {
+            "help": "blog directory path",
+            "default": "../blog",
+            "kw": "blog_dir_path",
+        },
+        "c": {
+            "help": "nginx cache directory path",
+            "default": "/nginx_cache",
+            "kw": "cache_dir_path",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    warm_cache(**final_kwargs)
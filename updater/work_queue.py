@@ -0,0 +1,310 @@
+import argparse
+import importlib
+import os
+import pickle
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from multiprocessing import Process, cpu_count
+
+from job_watchdog import feed_queue, run_jobs
+
+# Seconds a worker holds a job without renewing its lease. A job whose
+# lease runs out, e.g. because its worker's host went down, goes back to
+# the queue.
+lease_seconds = 60
+
+# Leases a job may lose before it is given up as "lost"
+max_attempts = 3
+
+# Jobs waiting in the queue at any time
+max_pending = 256
+
+# Seconds between polls of the queue
+poll_interval = 1
+
+schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result BLOB
+)
+"""
+
+
+def connect(queue_path):
+
+    # Transactions are begun explicitly
+    conn = sqlite3.connect(queue_path, timeout=60, isolation_level=None)
+    conn.execute(schema)
+
+    return conn
+
+
+def lease_job(conn, worker_name):
+    # The oldest job nobody holds, or None
+
+    now = time.time()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT key, payload FROM jobs"
+            " WHERE (status = 'pending'"
+            " OR (status = 'leased' AND lease_until < ?))"
+            " AND attempts < ?"
+            " ORDER BY rowid LIMIT 1",
+            (now, max_attempts),
+        ).fetchone()
+
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?,"
+                " lease_until = ?, attempts = attempts + 1 WHERE key = ?",
+                (worker_name, now + lease_seconds, row[0]),
+            )
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    conn.execute("COMMIT")
+
+    return row
+
+
+def call_job(payload):
+    # Runs in the worker processes of job_watchdog.run_jobs
+
+    (module_name, func_name), args = pickle.loads(payload)
+    func = getattr(importlib.import_module(module_name), func_name)
+
+    try:
+        return "done", func(args)
+    except Exception as e:
+        return "error", e
+
+
+def work(queue_path, n_workers, timeout=None, memory_limit=None):
+    """
+    Run jobs from the queue at queue_path, n_workers at a time, with the
+    limits of job_watchdog.run_jobs, until terminated.
+    """
+
+    # So that run_jobs stops its worker processes on the way out
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+
+    held_keys = set()
+
+    # run_jobs reads jobs ahead of its worker processes, so a job is only
+    # leased once one of them is free for it
+    free_workers = threading.Semaphore(n_workers)
+
+    def leased_jobs():
+
+        lease_conn = connect(queue_path)
+
+        while True:
+            free_workers.acquire()
+            job = lease_job(lease_conn, worker_name)
+
+            while job is None:
+                time.sleep(poll_interval)
+                job = lease_job(lease_conn, worker_name)
+
+            held_keys.add(job[0])
+            yield job
+
+    def renew_leases():
+
+        renew_conn = connect(queue_path)
+
+        while True:
+            time.sleep(lease_seconds / 3)
+
+            for key in list(held_keys):
+                renew_conn.execute(
+                    "UPDATE jobs SET lease_until = ?"
+                    " WHERE key = ? AND worker = ? AND status = 'leased'",
+                    (time.time() + lease_seconds, key, worker_name),
+                )
+
+    threading.Thread(target=renew_leases, daemon=True).start()
+
+    conn = connect(queue_path)
+
+    print(f"Worker {worker_name} on {queue_path}")
+
+    for key, status, result in run_jobs(
+        call_job,
+        leased_jobs(),
+        n_workers,
+        timeout=timeout,
+        memory_limit=memory_limit,
+    ):
+        if status == "done":
+            status, result = result
+
+        # Unless the lease was lost and the job went to another worker
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?"
+            " WHERE key = ? AND worker = ? AND status = 'leased'",
+            (status, pickle.dumps(result), key, worker_name),
+        )
+
+        held_keys.discard(key)
+        free_workers.release()
+
+
+def run_queued_jobs(
+    func_ref,
+    jobs,
+    queue_path,
+    n_workers=0,
+    timeout=None,
+    memory_limit=None,
+):
+    """
+    Like job_watchdog.run_jobs, but through a queue in the SQLite database
+    at queue_path. Jobs are run by n_workers local worker processes and by
+    any number of `python work_queue.py` workers on hosts that share the
+    database file. status can also be "lost", for a job that lost its
+    lease max_attempts times.
+
+    func_ref is a (module name, function name) pair that the workers
+    import, rather than the function, which pickles as `__main__.<name>`
+    when its module is run as a script.
+    """
+
+    conn = connect(queue_path)
+
+    # A queue serves one run at a time
+    conn.execute("DELETE FROM jobs")
+
+    # Started before feed_queue's thread
+    local_workers = []
+    if n_workers > 0:
+        local_workers.append(
+            Process(
+                target=work,
+                args=(queue_path, n_workers, timeout, memory_limit),
+            )
+        )
+        local_workers[0].start()
+
+    job_queue, job_errors = feed_queue(jobs, max_pending)
+
+    jobs_planned = False
+    n_queued = 0
+
+    try:
+        while True:
+            # Keep the queue topped up with planned jobs
+            while not jobs_planned and n_queued < max_pending:
+                if job_queue.empty():
+                    break
+
+                job = job_queue.get()
+
+                if job is None:
+                    if job_errors:
+                        raise job_errors[0]
+                    jobs_planned = True
+                    break
+
+                key, args = job
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (key, payload)"
+                    " VALUES (?, ?)",
+                    (key, pickle.dumps((func_ref, args))),
+                )
+                n_queued += 1
+
+            conn.execute(
+                "UPDATE jobs SET status = 'lost'"
+                " WHERE status = 'leased' AND lease_until < ?"
+                " AND attempts >= ?",
+                (time.time(), max_attempts),
+            )
+
+            rows = conn.execute(
+                "SELECT key, status, result FROM jobs"
+                " WHERE status NOT IN ('pending', 'leased')"
+            ).fetchall()
+
+            for key, status, result in rows:
+                conn.execute("DELETE FROM jobs WHERE key = ?", (key,))
+                n_queued -= 1
+
+                result = pickle.loads(result) if result is not None else None
+
+                if status == "error":
+                    raise result
+
+                yield key, status, result
+
+            if jobs_planned and n_queued == 0:
+                break
+
+            if not rows:
+                time.sleep(poll_interval)
+    finally:
+        for process in local_workers:
+            process.terminate()
+            process.join()
+
+
+if __name__ == "__main__":
+
+    # The jobs' functions and models are imported from here
+    import run_models
+
+    args_dict = {
+        "q": {
+            "help": "queue database path",
+            "default": "../data/queue.sqlite",
+            "kw": "queue_path",
+        },
+        "w": {
+            "help": "number of jobs run at once",
+            "default": str(cpu_count()),
+            "kw": "n_workers",
+        },
+        "t": {
+            "help": "seconds a job may run",
+            "default": str(run_models.job_timeout),
+            "kw": "timeout",
+        },
+        "m": {
+            "help": "bytes of memory a job may use",
+            "default": str(run_models.job_memory_limit),
+            "kw": "memory_limit",
+        },
+    }
+
+    parser = argparse.ArgumentParser()
+
+    for k, v in args_dict.items():
+        parser.add_argument(f"--{k}", help=v["help"])
+
+    input_args = vars(parser.parse_args())
+
+    final_kwargs = {}
+    for k, v in args_dict.items():
+        final_kwargs[v["kw"]] = (
+            input_args[k] if input_args[k] else v["default"]
+        )
+
+    final_kwargs["n_workers"] = int(final_kwargs["n_workers"])
+    final_kwargs["timeout"] = float(final_kwargs["timeout"])
+    final_kwargs["memory_limit"] = int(final_kwargs["memory_limit"])
+
+    work(**final_kwargs)